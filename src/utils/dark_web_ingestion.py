@@ -19,52 +19,76 @@ import os
 import json
 import time
 import logging
-from typing import List, Dict, Any, Optional
-import hashlib
+import atexit
+import queue
+import threading
+from typing import List, Dict, Any, Optional, Set
 import re
-from functools import wraps
+from functools import cached_property, wraps
 import traceback
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import html
+import mmap
 import sys
 import random
-from urllib.parse import urlparse
-import tempfile
-import subprocess
+import lxml.html
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from twisted.internet import reactor
-from multiprocessing import Process, Queue
+import multiprocessing
 
 # Import the stealth networking module
 from stealth_net import StealthSession, randomize_environment_variables
 
 # Import the Vault integration
-from vault_integration import get_tor_credentials, get_database_config, get_webhook_url
+from vault_integration import get_all_config
 
 # Import Deep Explorer integration
 from deep_ingest import run_discovery_pipeline
 
 # Import Scrapy spider
-from src.utils.scrapy_spider.spiders.onion_spider import OnionSpider
+from src.utils.scrapy_spider.spiders.onion_spider import OnionSpider, ONION_URL_RE
+from src.utils.scrapy_spider.pipelines import source_url_hash, load_embedding_model, chunk_text, HNSW_BULK_METADATA
 
 # Environment variable configuration with defaults from Vault or environment
-tor_creds = get_tor_credentials()
-db_config = get_database_config()
+# (the Vault reads are made concurrently)
+vault_config = get_all_config()
+tor_creds = vault_config["tor"]
+db_config = vault_config["database"]
 TOR_SOCKS_HOST = tor_creds["socks_host"]
 TOR_SOCKS_PORT = int(tor_creds["socks_port"])
 CHROMA_DB_PATH = db_config["path"]
 COLLECTION_NAME = db_config["collection"]
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 OVERLAP = int(os.getenv("OVERLAP", "200"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "32"))
+CRAWL_CONCURRENCY_PER_DOMAIN = int(os.getenv("CRAWL_CONCURRENCY_PER_DOMAIN", "8"))
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", str(10 * 1024 * 1024)))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
 MODEL_NAME = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE") or None
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_FLUSH_CHUNKS = int(os.getenv("EMBEDDING_FLUSH_CHUNKS", "256"))
+EMBEDDING_FLUSH_INTERVAL = float(os.getenv("EMBEDDING_FLUSH_INTERVAL", "2"))
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "200"))
+CHROMA_UNSAFE_BULK = os.getenv("CHROMA_UNSAFE_BULK", "false").lower() == "true"
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "0"))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-WEBHOOK_URL = get_webhook_url()
+FAILED_URLS_LOG = os.getenv("FAILED_URLS_LOG") or None
+WEBHOOK_URL = vault_config["webhook"]
+
+# Maximum number of URL hashes sent in a single `$in` metadata query
+INGESTED_LOOKUP_BATCH = 500
 
 # Stealth mode configuration
 USE_STEALTH_MODE = os.getenv("USE_STEALTH_MODE", "false").lower() == "true"
 USE_MULTI_HOP = os.getenv("USE_MULTI_HOP", "false").lower() == "true"
 CIRCUIT_HOPS = int(os.getenv("CIRCUIT_HOPS", "3"))
+TOR_MAX_REQUESTS_PER_CIRCUIT = int(os.getenv("TOR_MAX_REQUESTS_PER_CIRCUIT", "10"))
 USE_TLS_FINGERPRINT_RANDOMIZATION = os.getenv("USE_TLS_FINGERPRINT_RANDOMIZATION", "false").lower() == "true"
 USE_I2P_FALLBACK = os.getenv("USE_I2P_FALLBACK", "false").lower() == "true"
 TOR2_SOCKS_HOST = os.getenv("TOR2_SOCKS_HOST", TOR_SOCKS_HOST)
@@ -84,84 +108,127 @@ logging.basicConfig(
 )
 logger = logging.getLogger("dark_web_ingestion")
 
-# Make sure we don't log sensitive data
+# Make sure we don't log sensitive data: onion addresses and IP addresses,
+# matched in a single pass and replaced according to which group hit
+_LOG_REDACT_RE = re.compile(r'(?P<onion>[a-z2-7]{16,56}\.onion)|(?P<ip>(?:\d{1,3}\.){3}\d{1,3})')
+_LOG_REDACTIONS = {'onion': '[REDACTED_ONION]', 'ip': '[REDACTED_IP]'}
+
+def _log_redaction(match):
+    return _LOG_REDACTIONS[match.lastgroup]
+
 class SensitiveFilter(logging.Filter):
     def filter(self, record):
-        if record.getMessage().find('.onion') != -1:
-            # Redact full onion URLs in logs
-            record.msg = re.sub(r'([a-z2-7]{16,56}\.onion)', '[REDACTED_ONION]', record.msg)
-        # Also redact IP addresses
-        if isinstance(record.msg, str):
-            record.msg = re.sub(r'((?:\d{1,3}\.){3}\d{1,3})', '[REDACTED_IP]', record.msg)
+        msg = record.msg
+        # Both patterns contain a dot, so messages without one (the common
+        # case) skip the regex scan entirely
+        if isinstance(msg, str) and '.' in msg:
+            record.msg = _LOG_REDACT_RE.sub(_log_redaction, msg)
         return True
 
 logger.addFilter(SensitiveFilter())
 
-# Try to import required packages
+# orjson is optional; it parses large JSON URL lists and serializes alert
+# payloads several times faster
 try:
-    from torpy.http.requests import TorRequests
-    from bs4 import BeautifulSoup
-    import chromadb
-    from sentence_transformers import SentenceTransformer
-except ImportError as e:
-    logger.error(f"Required package not found: {str(e)}")
-    logger.info("Installing dependencies...")
-    import subprocess
-    try:
-        subprocess.check_call([
-            "pip", "install", 
-            "torpy>=1.1.6", "beautifulsoup4>=4.12.2", "chromadb>=0.4.18", 
-            "sentence-transformers>=2.2.2", "requests>=2.31.0",
-            "stem>=1.8.1", "tls-client>=0.2.0", "pysocks>=1.7.1",
-            "scrapy>=2.8.0", "readability-lxml>=0.8.1"
-        ])
-        # Now import after installation
-        from torpy.http.requests import TorRequests
-        from bs4 import BeautifulSoup
-        import chromadb
-        from sentence_transformers import SentenceTransformer
-    except Exception as install_error:
-        logger.critical(f"Failed to install dependencies: {str(install_error)}")
-        sys.exit(1)
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_dumps(obj) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, using orjson when available."""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+# Shared parser for sanitize_html; input is always passed as UTF-8 bytes
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+# Text nodes that are not inside script, style, or embedded/interactive elements
+_SAFE_TEXT_XPATH = lxml.etree.XPath(
+    '//text()[not(ancestor::script or ancestor::style or ancestor::iframe'
+    ' or ancestor::object or ancestor::embed or ancestor::form)]'
+)
+
+# Kept-alive connection for webhook alerts, so a burst of anomalies does not
+# pay a TCP/TLS handshake per post. Retry covers connection failures only;
+# POSTs are not resent once the request went out
+_WEBHOOK_SESSION = requests.Session()
+_WEBHOOK_ADAPTER = HTTPAdapter(pool_connections=2, pool_maxsize=4,
+                               max_retries=Retry(total=2, backoff_factor=0.2))
+_WEBHOOK_SESSION.mount('https://', _WEBHOOK_ADAPTER)
+_WEBHOOK_SESSION.mount('http://', _WEBHOOK_ADAPTER)
+
+# Serialized alerts waiting for the background webhook sender
+_ALERT_QUEUE = queue.Queue()
+_alert_sender = None
+_alert_sender_lock = threading.Lock()
+
+def _send_alerts():
+    """Post queued alerts to the webhook until a None sentinel arrives."""
+    while True:
+        payload = _ALERT_QUEUE.get()
+        if payload is None:
+            break
+        try:
+            _WEBHOOK_SESSION.post(
+                WEBHOOK_URL, 
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=5
+            )
+        except Exception as e:
+            logger.error(f"Failed to send webhook alert: {str(e)}")
+
+def _stop_alert_sender():
+    """Deliver alerts still queued when the interpreter exits."""
+    if _alert_sender is not None and _alert_sender.is_alive():
+        _ALERT_QUEUE.put(None)
+        _alert_sender.join(timeout=10)
+
+atexit.register(_stop_alert_sender)
 
 def alert_on_anomaly(description, details=None):
     """Send alerts for anomalies through webhook or logging"""
+    global _alert_sender
     logger.warning(f"ANOMALY: {description}")
     
     if details:
-        logger.warning(f"Details: {json.dumps(details)}")
+        logger.warning(f"Details: {json_dumps(details).decode('utf-8')}")
         
     if WEBHOOK_URL:
-        try:
-            requests.post(
-                WEBHOOK_URL, 
-                json={"event": "anomaly", "description": description, "details": details},
-                timeout=5
-            )
-        except Exception as e:
-            logger.error(f"Failed to send webhook alert: {str(e)}")
+        # Posting happens on a background thread, so a slow or unreachable
+        # webhook never holds up the code that raised the alert
+        with _alert_sender_lock:
+            # Threads don't survive fork, so a child process starts its own
+            if _alert_sender is None or not _alert_sender.is_alive():
+                _alert_sender = threading.Thread(target=_send_alerts, name="webhook-alerts", daemon=True)
+                _alert_sender.start()
+        _ALERT_QUEUE.put(json_dumps({"event": "anomaly", "description": description, "details": details}))
 
 def anomaly_detector(func):
     """Decorator to catch and report anomalies in functions"""
+    name = func.__name__
+    
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        # Monotonic clock so wall-clock adjustments can't fake or hide a slow call
+        start_ns = time.monotonic_ns()
         try:
             result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
+            elapsed_ns = time.monotonic_ns() - start_ns
             
             # Check for anomalies in execution time
-            if execution_time > 300:  # More than 5 minutes
+            if elapsed_ns > 300_000_000_000:  # More than 5 minutes
                 alert_on_anomaly(
-                    f"Function {func.__name__} took too long to execute",
-                    {"execution_time": execution_time, "function": func.__name__}
+                    f"Function {name} took too long to execute",
+                    {"execution_time": elapsed_ns / 1e9, "function": name}
                 )
                 
             return result
         except Exception as e:
             alert_on_anomaly(
-                f"Exception in {func.__name__}: {str(e)}",
-                {"traceback": traceback.format_exc(), "function": func.__name__}
+                f"Exception in {name}: {str(e)}",
+                {"traceback": traceback.format_exc(), "function": name}
             )
             raise
     return wrapper
@@ -176,37 +243,30 @@ def run_scrapy_spider(url_list, output_queue, settings=None):
         settings: Custom settings for the spider
     """
     try:
-        # Create temporary file with URLs
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-            json.dump(url_list, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Initialize Scrapy process with settings
+        # Initialize Scrapy process with settings. Use 'cmdline' priority so the
+        # values passed in by the caller win over OnionSpider.custom_settings.
         process_settings = get_project_settings()
         if settings:
             for key, value in settings.items():
-                process_settings.set(key, value)
+                process_settings.set(key, value, priority='cmdline')
                 
         process = CrawlerProcess(process_settings)
         
         # Configure spider
+        crawler = process.create_crawler(OnionSpider)
         process.crawl(
-            OnionSpider,
-            urls_file=temp_file_path
+            crawler,
+            urls=url_list
         )
         
         # Run the spider and wait for it to finish
         process.start()
         
-        # Clean up temp file
-        os.unlink(temp_file_path)
-        
-        # Get stats from spider
-        # In a real implementation, you'd need to capture stats from the crawler
-        # For now, we'll just send a placeholder
+        # Report what the storage pipeline actually wrote
         output_queue.put({
             "success": True,
             "urls_processed": len(url_list),
+            "chunks_ingested": crawler.stats.get_value('chroma/chunks_stored', 0),
             "error": None
         })
         
@@ -215,48 +275,96 @@ def run_scrapy_spider(url_list, output_queue, settings=None):
         output_queue.put({
             "success": False,
             "urls_processed": 0,
+            "chunks_ingested": 0,
             "error": str(e)
         })
 
+def crawl_process_context():
+    """
+    Multiprocessing context for the crawl processes.
+    
+    Each crawl needs a process of its own (Twisted's reactor can't be
+    restarted), but this one runs the Vault renewal and webhook threads, so
+    it isn't forked directly. A fork server, preloaded with this module,
+    imports Scrapy, Chroma and the pipelines and reads the Vault config
+    once; every crawl is then a cheap fork of that server. Without fork
+    servers each crawl starts a fresh interpreter.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Only read when the server starts, on the first crawl
+    context.set_forkserver_preload(list(dict.fromkeys(["__main__", run_scrapy_spider.__module__])))
+    return context
+
 class DarkWebIngestion:
     def __init__(self):
-        """Initialize the ingestion module with Chroma DB and sentence transformer."""
+        """
+        Initialize the ingestion module.
+        
+        The Chroma client, embedding model and stealth session are created
+        on first use, so workflows that only discover or list URLs don't pay
+        for loading them.
+        """
         # Set random environment variables for fingerprint diversity
         if USE_STEALTH_MODE:
             randomize_environment_variables()
             logger.info("Stealth mode enabled with randomized environment")
         
+        # URL hashes already confirmed to be stored. Pages are never removed
+        # during a run, so a positive answer can be remembered and later
+        # calls only query Chroma for hashes not seen before
+        self._ingested_url_hashes = set()
+    
+    @cached_property
+    def chroma_client(self):
+        """Persistent Chroma client, opened on first use."""
         # Ensure persistence directory exists
         os.makedirs(CHROMA_DB_PATH, exist_ok=True)
         
-        logger.info(f"Initializing Chroma client with persistence at {CHROMA_DB_PATH}")
-        self.chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        # Imported here so the CLI and spider-only paths do not pay for it
+        import chromadb
         
-        # Get or create the collection
+        logger.info(f"Initializing Chroma client with persistence at {CHROMA_DB_PATH}")
+        return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    
+    @cached_property
+    def collection(self):
+        """Content collection, created if it does not exist yet."""
         try:
-            self.collection = self.chroma_client.get_collection(COLLECTION_NAME)
+            collection = self.chroma_client.get_collection(COLLECTION_NAME)
             logger.info(f"Using existing collection '{COLLECTION_NAME}'")
         except ValueError:
             logger.info(f"Creating new collection '{COLLECTION_NAME}'")
-            self.collection = self.chroma_client.create_collection(
+            collection = self.chroma_client.create_collection(
                 name=COLLECTION_NAME,
-                metadata={"description": "SamGPT Dark Web content repository"}
+                metadata={"description": "SamGPT Dark Web content repository", **HNSW_BULK_METADATA}
             )
-        
+        return collection
+    
+    @cached_property
+    def model(self):
+        """Sentence transformer model, loaded on first use."""
         logger.info(f"Loading sentence transformer model: {MODEL_NAME}")
-        self.model = SentenceTransformer(MODEL_NAME)
-        
-        # Initialize stealth session if enabled
+        return load_embedding_model(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_MODEL_FILE, EMBEDDING_THREADS)
+    
+    @cached_property
+    def stealth_session(self) -> Optional[StealthSession]:
+        """Stealth session when stealth mode is enabled, created on first use."""
         if USE_STEALTH_MODE:
-            self.stealth_session = StealthSession(
+            stealth_session = StealthSession(
                 tor_socks_host=TOR_SOCKS_HOST,
                 tor_socks_port=TOR_SOCKS_PORT,
                 tor_control_port=int(os.getenv("TOR_CONTROL_PORT", "9051")),
                 tor_password=os.getenv("TOR_PASSWORD", None),
                 i2p_http_proxy=I2P_HTTP_PROXY,
-                circuit_hops=CIRCUIT_HOPS
+                circuit_hops=CIRCUIT_HOPS,
+                rotate_after=TOR_MAX_REQUESTS_PER_CIRCUIT,
+                max_response_bytes=CRAWL_MAX_BYTES
             )
             logger.info(f"Stealth session initialized with {CIRCUIT_HOPS} Tor hops")
+            return stealth_session
+        return None
     
     def chunk_text(self, text: str) -> List[str]:
         """
@@ -265,43 +373,21 @@ class DarkWebIngestion:
         This is a simple approximation - in production you'd want a more 
         sophisticated chunking strategy.
         """
-        # Simple approximation: average English word is ~5 characters
-        # and ~4.7 words per token
-        words = text.split()
-        chunks = []
-        
-        # Estimate words per chunk (rough approximation)
-        words_per_chunk = CHUNK_SIZE // 5
-        words_overlap = OVERLAP // 5
-        
-        for i in range(0, len(words), words_per_chunk - words_overlap):
-            chunk = " ".join(words[i:i + words_per_chunk])
-            if chunk:  # Ensure we don't add empty chunks
-                chunks.append(chunk)
-                
-        return chunks
+        return chunk_text(text, CHUNK_SIZE, OVERLAP)
     
     def sanitize_html(self, html_content: str) -> str:
         """Sanitize HTML content to prevent XSS and injection attacks"""
-        # Use BeautifulSoup to parse and clean HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Parse with lxml's C parser; the text is re-encoded so the parser
+        # never has to honour a conflicting encoding declaration in the page
+        try:
+            doc = lxml.html.document_fromstring(html_content.encode('utf-8'), parser=_HTML_PARSER)
+        except lxml.etree.ParserError:
+            return ""
         
-        # Remove potentially dangerous elements
-        for tag in soup.find_all(['script', 'iframe', 'object', 'embed', 'form']):
-            tag.decompose()
-            
-        # Remove event handlers from all remaining tags
-        for tag in soup.find_all(True):
-            for attr in list(tag.attrs):
-                if attr.startswith('on'):
-                    del tag[attr]
-                # Remove javascript: URLs
-                elif attr == 'href' or attr == 'src':
-                    if tag[attr].startswith('javascript:'):
-                        del tag[attr]
-                        
-        # Get the sanitized text
-        sanitized_text = soup.get_text(separator=' ', strip=True)
+        # Collect text outside potentially dangerous elements. Only text nodes
+        # are returned, so event handler attributes and javascript: URLs can't
+        # reach the output and need no separate pass
+        sanitized_text = ' '.join(filter(None, (text.strip() for text in _SAFE_TEXT_XPATH(doc))))
         
         # Additional HTML entity decoding
         sanitized_text = html.unescape(sanitized_text)
@@ -310,46 +396,34 @@ class DarkWebIngestion:
     
     def url_to_id(self, url: str) -> str:
         """Create a deterministic ID from a URL."""
-        return hashlib.sha256(url.encode()).hexdigest()
+        return source_url_hash(url)
     
     def is_already_ingested(self, url: str) -> bool:
-        """Check if URL has already been ingested by querying metadata."""
-        url_id = self.url_to_id(url)
-        # Query with empty embedding list to just check metadata
-        result = self.collection.get(
-            where={"source_url_hash": url_id},
-            limit=1
-        )
-        return len(result["ids"]) > 0
+        """Check if URL has already been ingested."""
+        return bool(self.get_ingested_url_hashes([self.url_to_id(url)]))
+    
+    def get_ingested_url_hashes(self, url_hashes: List[str]) -> Set[str]:
+        """Return the URL hashes (see url_to_id) that have already been ingested."""
+        # Every stored page has a first chunk with id "<url hash>_0", so look
+        # those ids up directly (one primary-key query per batch of URLs)
+        # instead of filtering on metadata
+        url_hashes = set(url_hashes)
+        ingested = url_hashes & self._ingested_url_hashes
+        chunk_ids = [f"{url_hash}_0" for url_hash in url_hashes - ingested]
+        
+        for start in range(0, len(chunk_ids), INGESTED_LOOKUP_BATCH):
+            result = self.collection.get(ids=chunk_ids[start:start + INGESTED_LOOKUP_BATCH], include=[])
+            ingested.update(chunk_id[:-2] for chunk_id in result["ids"])
+        
+        self._ingested_url_hashes |= ingested
+        return ingested
     
     def validate_onion_url(self, url: str) -> bool:
         """Validate if a URL is a proper .onion address"""
-        try:
-            parsed = urlparse(url)
-            # Check if scheme is present
-            if not parsed.scheme or not parsed.netloc:
-                return False
-                
-            # Check if it's a .onion domain
-            if not parsed.netloc.endswith('.onion'):
-                return False
-                
-            # Check for valid onion address format (v2 or v3)
-            hostname = parsed.netloc.split('.')[0]
-            # V3 onion addresses are 56 chars, V2 are 16 chars
-            if len(hostname) not in (16, 56):
-                return False
-                
-            # Check for valid base32 chars (a-z2-7)
-            if not re.match(r'^[a-z2-7]+$', hostname):
-                return False
-                
-            return True
-        except Exception:
-            return False
+        return isinstance(url, str) and ONION_URL_RE.match(url) is not None
     
     @anomaly_detector
-    def ingest_onion(self, url_list: List[str], timeout: int = 60) -> Dict[str, Any]:
+    def ingest_onion(self, url_list: List[str], timeout: int = 30) -> Dict[str, Any]:
         """
         Fetch content from .onion URLs using Scrapy + Tor, process text, and store in Chroma.
         
@@ -384,9 +458,13 @@ class DarkWebIngestion:
             return stats
         
         # Filter out already ingested URLs
+        # Hash each URL once; the hash cache is bounded, so recomputing per
+        # lookup would hash every URL twice on large lists
+        url_ids = [self.url_to_id(url) for url in valid_urls]
+        ingested_hashes = self.get_ingested_url_hashes(url_ids)
         urls_to_process = []
-        for url in valid_urls:
-            if self.is_already_ingested(url):
+        for url, url_id in zip(valid_urls, url_ids):
+            if url_id in ingested_hashes:
                 logger.info("URL already ingested, skipping (URL redacted)")
                 stats["urls_skipped"] += 1
             else:
@@ -399,7 +477,15 @@ class DarkWebIngestion:
         # Setup Scrapy settings
         scrapy_settings = {
             'LOG_LEVEL': LOG_LEVEL,
+            'FAILED_URLS_LOG': FAILED_URLS_LOG,
             'DOWNLOAD_TIMEOUT': timeout,
+            'CONCURRENT_REQUESTS': CRAWL_CONCURRENCY,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': CRAWL_CONCURRENCY_PER_DOMAIN,
+            # Pipelines and circuit rotation wait on reactor pool threads,
+            # about one per request in flight
+            'REACTOR_THREADPOOL_MAXSIZE': max(40, CRAWL_CONCURRENCY + 8),
+            'DOWNLOAD_MAXSIZE': CRAWL_MAX_BYTES,
+            'PARSE_WORKERS': PARSE_WORKERS,
             'TOR_SOCKS_HOST': TOR_SOCKS_HOST,
             'TOR_SOCKS_PORT': TOR_SOCKS_PORT,
             'TOR_CONTROL_PORT': int(os.getenv("TOR_CONTROL_PORT", "9051")),
@@ -407,15 +493,26 @@ class DarkWebIngestion:
             'CHROMA_DB_PATH': CHROMA_DB_PATH,
             'CHROMA_COLLECTION_NAME': COLLECTION_NAME,
             'EMBEDDING_MODEL_NAME': MODEL_NAME,
+            'EMBEDDING_BACKEND': EMBEDDING_BACKEND,
+            'EMBEDDING_MODEL_FILE': EMBEDDING_MODEL_FILE,
+            'EMBEDDING_BATCH_SIZE': EMBEDDING_BATCH_SIZE,
+            'EMBEDDING_THREADS': EMBEDDING_THREADS,
+            'EMBEDDING_FLUSH_CHUNKS': EMBEDDING_FLUSH_CHUNKS,
+            'EMBEDDING_FLUSH_INTERVAL': EMBEDDING_FLUSH_INTERVAL,
+            'CHROMA_WRITE_BATCH_SIZE': CHROMA_WRITE_BATCH_SIZE,
+            'CHROMA_UNSAFE_BULK': CHROMA_UNSAFE_BULK,
+            'NEAR_DUPLICATE_DISTANCE': NEAR_DUPLICATE_DISTANCE,
             'CONTENT_CHUNK_SIZE': CHUNK_SIZE,
             'CONTENT_CHUNK_OVERLAP': OVERLAP,
-            'TOR_MAX_REQUESTS_PER_CIRCUIT': 10,
+            'TOR_MAX_REQUESTS_PER_CIRCUIT': TOR_MAX_REQUESTS_PER_CIRCUIT,
             'TOR_ENABLE_RANDOM_ROTATION': True,
         }
         
-        # Run spider in a separate process
-        output_queue = Queue()
-        spider_process = Process(target=run_scrapy_spider, args=(urls_to_process, output_queue, scrapy_settings))
+        # Run spider in a separate process, forked from the preloaded fork
+        # server; it loads the embedding model itself
+        mp_context = crawl_process_context()
+        output_queue = mp_context.Queue()
+        spider_process = mp_context.Process(target=run_scrapy_spider, args=(urls_to_process, output_queue, scrapy_settings))
         
         try:
             logger.info(f"Starting Scrapy spider for {len(urls_to_process)} URLs")
@@ -427,9 +524,7 @@ class DarkWebIngestion:
             
             if results["success"]:
                 stats["urls_processed"] = results["urls_processed"]
-                # Chunks would be processed and stored by Scrapy pipelines
-                # For now, as a placeholder, we'll set a reasonable value
-                stats["chunks_ingested"] = results["urls_processed"] * 5  # Assume ~5 chunks per URL
+                stats["chunks_ingested"] = results["chunks_ingested"]
             else:
                 stats["errors"].append(f"Spider error: {results['error']}")
                 
@@ -509,18 +604,27 @@ def load_url_list(file_path: str) -> List[str]:
         logger.error(f"File not found: {file_path}")
         return []
     
-    with open(file_path, 'r') as f:
-        content = f.read().strip()
-        
-        # Try to parse as JSON
-        if content.startswith('[') and content.endswith(']'):
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                pass
-        
-        # Fall back to text file parsing (one URL per line)
-        return [line.strip() for line in content.split('\n') if line.strip()]
+    # Map the file instead of reading it into one string, so large plain
+    # text lists are decoded a line at a time
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Try to parse as JSON
+            if re.match(rb'\s*\[', mm):
+                try:
+                    return orjson.loads(mm[:]) if orjson else json.loads(mm[:])
+                except ValueError:
+                    pass
+            
+            # Fall back to text file parsing (one URL per line)
+            urls = []
+            for line in iter(mm.readline, b''):
+                line = line.decode('utf-8').strip()
+                if line:
+                    urls.append(line)
+            return urls
 
 @anomaly_detector
 def main(url_file: str = None, urls: List[str] = None, stealth_mode: bool = False, 
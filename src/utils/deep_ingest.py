@@ -7,9 +7,12 @@ based on search queries, then feeds them into our ingestion pipeline.
 """
 
 import os
+import mmap
 import subprocess
 import logging
-import time
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any
 import re
 import json
@@ -22,6 +25,14 @@ logger = logging.getLogger("deep_ingest")
 # Path to Deep Explorer directory
 DEEP_EXPLORER_PATH = os.path.join(os.path.dirname(__file__), '../../crawlers/deep_explorer')
 
+# Deep Explorer searches run at once; each is its own process that spends
+# most of its time waiting on Tor
+DISCOVERY_WORKERS = int(os.getenv("DISCOVERY_WORKERS", "4"))
+
+# .onion URLs with both http and https prefixes; a bytes pattern so results
+# files can be scanned in place without decoding them
+ONION_URL_PATTERN = re.compile(rb'https?://[a-z2-7]{16,56}\.onion\S*')
+
 def discover_onions(query: str, limit: int = 50) -> List[str]:
     """
     Discover .onion URLs by crawling the dark web using Deep Explorer.
@@ -33,8 +44,6 @@ def discover_onions(query: str, limit: int = 50) -> List[str]:
     Returns:
         List of discovered .onion URLs
     """
-    results_file = os.path.join(DEEP_EXPLORER_PATH, "results.txt")
-    
     # Ensure the Deep Explorer directory exists
     if not os.path.exists(DEEP_EXPLORER_PATH):
         logger.error(f"Deep Explorer directory not found at {DEEP_EXPLORER_PATH}")
@@ -42,11 +51,21 @@ def discover_onions(query: str, limit: int = 50) -> List[str]:
     
     logger.info(f"Starting Deep Explorer search for '{query}' with limit {limit}")
     
+    # Deep Explorer appends to results.txt in its working directory, so each
+    # run gets a private one; a shared file would hand every query the URLs
+    # of all earlier runs, and grow (and be re-read) forever
+    with tempfile.TemporaryDirectory(prefix="deep_explorer_") as work_dir:
+        return _run_deep_explorer(query, limit, work_dir)
+
+def _run_deep_explorer(query: str, limit: int, work_dir: str) -> List[str]:
+    """Run one Deep Explorer search in work_dir and collect the URLs it found."""
+    results_file = os.path.join(work_dir, "results.txt")
+    
     try:
-        # Build command to run Deep Explorer
+        # Build command to run Deep Explorer with this interpreter
         cmd = [
-            "python", 
-            os.path.join(DEEP_EXPLORER_PATH, "deepexplorer.py"),
+            sys.executable,
+            os.path.abspath(os.path.join(DEEP_EXPLORER_PATH, "deepexplorer.py")),
             "--query", query,
             "--limit", str(limit),
             "--mode", "all",
@@ -57,7 +76,7 @@ def discover_onions(query: str, limit: int = 50) -> List[str]:
         logger.info(f"Executing: {' '.join(cmd)}")
         process = subprocess.Popen(
             cmd,
-            cwd=DEEP_EXPLORER_PATH,
+            cwd=work_dir,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
@@ -73,16 +92,7 @@ def discover_onions(query: str, limit: int = 50) -> List[str]:
             
         # Read and parse results
         if os.path.exists(results_file):
-            with open(results_file, 'r') as f:
-                content = f.read()
-                
-            # Extract and deduplicate onion URLs
-            # Look for .onion URLs with both http and https prefixes
-            onion_pattern = r'https?://[a-z2-7]{16,56}\.onion\S*'
-            urls = re.findall(onion_pattern, content)
-            
-            # Deduplicate URLs
-            unique_urls = list(set(urls))
+            unique_urls = _extract_onion_urls(results_file)
             
             logger.info(f"Discovered {len(unique_urls)} unique .onion URLs")
             return unique_urls
@@ -97,10 +107,30 @@ def discover_onions(query: str, limit: int = 50) -> List[str]:
         logger.error(f"Error during onion discovery: {str(e)}")
         return []
 
+def _extract_onion_urls(path: str) -> List[str]:
+    """
+    Collect the unique .onion URLs in a file, in order of first appearance.
+    
+    The file is memory-mapped and scanned with a bytes pattern, so it is
+    never read into (or decoded as) one large string.
+    """
+    with open(path, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            urls = dict.fromkeys(
+                match.group().decode('ascii', 'replace')
+                for match in ONION_URL_PATTERN.finditer(mm)
+            )
+    return list(urls)
+
 def run_discovery_pipeline(queries: List[str], limit_per_query: int = 20) -> List[str]:
     """
     Run the full discovery pipeline using multiple search queries.
     
+    Up to DISCOVERY_WORKERS queries are searched concurrently.
+    
     Args:
         queries: List of search queries to execute
         limit_per_query: Maximum number of URLs to discover per query
@@ -110,19 +140,22 @@ def run_discovery_pipeline(queries: List[str], limit_per_query: int = 20) -> Lis
     """
     all_urls = []
     
-    for query in queries:
+    def run_query(query: str) -> List[str]:
         try:
             logger.info(f"Processing query: '{query}'")
-            urls = discover_onions(query, limit_per_query)
-            all_urls.extend(urls)
-            
-            # Brief pause between queries to avoid overwhelming resources
-            time.sleep(1)
+            return discover_onions(query, limit_per_query)
         except Exception as e:
             logger.error(f"Error processing query '{query}': {str(e)}")
+            return []
+    
+    # Results are collected in query order, so the output does not depend
+    # on which search finishes first
+    with ThreadPoolExecutor(max_workers=max(1, min(DISCOVERY_WORKERS, len(queries)))) as executor:
+        for urls in executor.map(run_query, queries):
+            all_urls.extend(urls)
     
     # Final deduplication
-    unique_urls = list(set(all_urls))
+    unique_urls = list(dict.fromkeys(all_urls))
     logger.info(f"Total unique URLs discovered: {len(unique_urls)}")
     
     return unique_urls
@@ -0,0 +1,35 @@
+"""
+Scrapy download handlers for crawling through the local Tor proxy.
+"""
+
+import logging
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class PersistentProxyDownloadHandler(HTTP11DownloadHandler):
+    """
+    HTTP/1.1 download handler that keeps enough idle connections to the
+    proxy for every concurrent request.
+
+    Twisted's connection pool caps idle connections per pool key at
+    CONCURRENT_REQUESTS_PER_DOMAIN. Every plain-HTTP request sent through
+    an HTTP proxy shares the proxy's key, so with the stock handler most
+    connections to Privoxy are closed after one request and re-opened for
+    the next. Allowing CONCURRENT_REQUESTS of them lets each download slot
+    keep its connection alive.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Create handler from crawler settings."""
+        handler = super().from_crawler(crawler)
+
+        keepalive = crawler.settings.getint('CONCURRENT_REQUESTS')
+        if keepalive > handler._pool.maxPersistentPerHost:
+            handler._pool.maxPersistentPerHost = keepalive
+
+        logger.debug(f"Keeping up to {handler._pool.maxPersistentPerHost} idle connections per host")
+        return handler
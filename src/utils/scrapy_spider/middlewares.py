@@ -11,13 +11,17 @@ This module provides middlewares for:
 
 import logging
 import random
+import threading
 import time
+from collections import deque
 from typing import Optional, Union, Any
 
 from scrapy import signals
 from scrapy.http import Request, Response
 from scrapy.spiders import Spider
+import scrapy.exceptions
 from scrapy.exceptions import IgnoreRequest, NotConfigured
+from twisted.internet import defer, error, threads
 
 from stem import Signal
 from stem.control import Controller
@@ -31,6 +35,17 @@ class TorCircuitRotationMiddleware:
     or when an error occurs.
     """
     
+    # Names of exception types that should trigger circuit rotation. Matched
+    # by name so that Twisted's, Scrapy's and the builtin variants all count
+    ROTATION_TRIGGERS = frozenset({
+        'TimeoutError',
+        'DownloadTimeoutError',
+        'ConnectionRefusedError',
+        'ConnectionError',
+        'TunnelError',
+        'ProtocolError'
+    })
+    
     def __init__(self, 
                  max_requests_per_circuit: int = 10,
                  min_circuit_lifespan: int = 30,
@@ -58,6 +73,11 @@ class TorCircuitRotationMiddleware:
         
         self.request_count = 0
         self.last_rotation = time.time()
+        
+        # Authenticated control port connection, kept open between rotations;
+        # rotations run on reactor pool threads, so access is serialized
+        self._controller = None
+        self._controller_lock = threading.Lock()
         logger.info("Tor Circuit Rotation Middleware initialized")
     
     @classmethod
@@ -96,6 +116,8 @@ class TorCircuitRotationMiddleware:
     
     def spider_closed(self, spider):
         """Handle spider closed event."""
+        with self._controller_lock:
+            self._close_controller()
         logger.info(f"Spider {spider.name} closed with Tor circuit rotation middleware")
     
     def process_request(self, request, spider):
@@ -116,11 +138,14 @@ class TorCircuitRotationMiddleware:
             should_rotate = True
             logger.debug("Random circuit rotation triggered")
             
-        # Rotate the circuit if needed
+        # Rotate the circuit if needed; the request is held back until the
+        # new circuit is requested, without blocking the reactor
         if should_rotate:
-            self._rotate_tor_circuit(spider)
+            rotation = self._rotate_tor_circuit(spider)
             self.request_count = 0
             self.last_rotation = time.time()
+            if rotation is not None:
+                return rotation.addCallback(lambda _: None)
         
         # No need to modify the request
         return None
@@ -129,52 +154,86 @@ class TorCircuitRotationMiddleware:
         """Handle request exceptions by rotating circuit on certain errors."""
         error_type = type(exception).__name__
         
-        # List of exception types that should trigger circuit rotation
-        rotation_triggers = [
-            'TimeoutError', 
-            'ConnectionRefusedError', 
-            'ConnectionError',
-            'TunnelError',
-            'ProtocolError'
-        ]
-        
-        if error_type in rotation_triggers:
+        if error_type in self.ROTATION_TRIGGERS:
             logger.warning(f"Error {error_type} triggered circuit rotation: {exception}")
-            self._rotate_tor_circuit(spider)
+            rotation = self._rotate_tor_circuit(spider)
             self.request_count = 0
             self.last_rotation = time.time()
             
             # Create a new request to retry
-            new_request = request.copy()
-            new_request.dont_filter = True
-            new_request.meta['retry_circuit_rotation'] = True
+            new_request = request.replace(
+                meta={**request.meta, 'retry_circuit_rotation': True},
+                dont_filter=True
+            )
+            
+            # Retry once the new circuit is requested
+            if rotation is not None:
+                return rotation.addCallback(lambda _: new_request)
             return new_request
         
         return None
     
     def _rotate_tor_circuit(self, spider):
-        """Rotate Tor circuit by sending NEWNYM signal."""
+        """
+        Start rotating the Tor circuit by sending a NEWNYM signal.
+        
+        The control port exchange runs on a reactor pool thread, so the
+        reactor keeps serving other requests while Tor responds.
+        
+        Returns:
+            Deferred firing with whether the circuit was rotated, or None if
+            the circuit is too young to rotate
+        """
         time_since_last = time.time() - self.last_rotation
         if time_since_last < self.min_circuit_lifespan:
             logger.debug(f"Circuit too young to rotate ({time_since_last:.1f}s < {self.min_circuit_lifespan}s)")
-            return False
-            
-        try:
-            logger.info("Rotating Tor circuit...")
-            
-            with Controller.from_port(port=self.control_port) as controller:
+            return None
+        
+        return threads.deferToThread(self._send_newnym)
+    
+    def _send_newnym(self):
+        """Send NEWNYM over the control port connection."""
+        logger.info("Rotating Tor circuit...")
+        
+        with self._controller_lock:
+            # A kept connection may have been dropped by Tor since the last
+            # rotation, so a failure is retried once on a fresh one
+            for attempt in range(2):
+                try:
+                    self._get_controller().signal(Signal.NEWNYM)
+                    logger.info("Tor circuit successfully rotated")
+                    return True
+                    
+                except Exception as e:
+                    self._close_controller()
+                    if attempt:
+                        logger.error(f"Failed to rotate Tor circuit: {e}")
+        return False
+    
+    def _get_controller(self):
+        """Get the control port connection, connecting and authenticating if needed."""
+        if self._controller is None or not self._controller.is_alive():
+            self._close_controller()
+            controller = Controller.from_port(port=self.control_port)
+            try:
                 if self.control_password:
                     controller.authenticate(password=self.control_password)
                 else:
                     controller.authenticate()
-                
-                controller.signal(Signal.NEWNYM)
-                logger.info("Tor circuit successfully rotated")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Failed to rotate Tor circuit: {e}")
-            return False
+            except Exception:
+                controller.close()
+                raise
+            self._controller = controller
+        return self._controller
+    
+    def _close_controller(self):
+        """Close the control port connection, if open."""
+        if self._controller is not None:
+            try:
+                self._controller.close()
+            except Exception:
+                pass
+            self._controller = None
 
 class TLSFingerprintRandomizationMiddleware:
     """
@@ -193,6 +252,9 @@ class TLSFingerprintRandomizationMiddleware:
                 'safari_15_6_1', 'safari_16_0', 'opera_89', 'opera_90',
                 'edge_105', 'edge_106'
             ]
+            # One session per preset, kept for the middleware's lifetime so
+            # its connections and TLS session tickets can be reused
+            self._sessions = {}
             self.enabled = True
             logger.info("TLS Fingerprint Randomization Middleware initialized")
         except ImportError:
@@ -228,11 +290,8 @@ class TLSFingerprintRandomizationMiddleware:
         client_preset = random.choice(self.available_presets)
         
         try:
-            # Create a session with the selected fingerprint
-            session = self.tls_client.Session(
-                client_identifier=client_preset,
-                random_tls_extension_order=True
-            )
+            # Get the session with the selected fingerprint
+            session = self._get_session(client_preset)
             
             # Make the request using tls-client
             # But this requires handling cookies, headers, etc. manually
@@ -247,13 +306,35 @@ class TLSFingerprintRandomizationMiddleware:
             logger.error(f"Error applying TLS fingerprint: {e}")
             
         return None
+    
+    def _get_session(self, client_preset):
+        """Get the session for a client preset, creating it on first use."""
+        session = self._sessions.get(client_preset)
+        if session is None:
+            session = self._sessions[client_preset] = self.tls_client.Session(
+                client_identifier=client_preset,
+                random_tls_extension_order=True
+            )
+        return session
 
 class GracefulFailureRetryMiddleware:
     """
     Middleware to handle failures gracefully with retries.
     """
     
-    def __init__(self, max_retries=3, backoff_factor=1.5, priority_adjust=-1):
+    # Exceptions for a request that timed out, which is retried with the
+    # longer retry download timeout: Scrapy's download timeout (its own
+    # DownloadTimeoutError in newer releases, Twisted's before), a TCP
+    # connect timeout, and a Deferred that timed out
+    TIMEOUT_ERRORS = tuple(cls for cls in (
+        getattr(scrapy.exceptions, 'DownloadTimeoutError', None),
+        error.TimeoutError,
+        error.TCPTimedOutError,
+        defer.TimeoutError,
+    ) if cls is not None)
+    
+    def __init__(self, max_retries=3, backoff_factor=1.5, priority_adjust=-1,
+                 retry_download_timeout=90):
         """
         Initialize retry middleware.
         
@@ -261,10 +342,13 @@ class GracefulFailureRetryMiddleware:
             max_retries: Maximum number of retry attempts
             backoff_factor: Exponential backoff factor between retries
             priority_adjust: How much to adjust retry priority
+            retry_download_timeout: Download timeout for retries of requests
+                that timed out (first attempts keep DOWNLOAD_TIMEOUT)
         """
         self.max_retries = max_retries
         self.backoff_factor = backoff_factor
         self.priority_adjust = priority_adjust
+        self.retry_download_timeout = retry_download_timeout
         logger.info("Graceful Failure Retry Middleware initialized")
     
     @classmethod
@@ -273,11 +357,13 @@ class GracefulFailureRetryMiddleware:
         max_retries = crawler.settings.getint('RETRY_MAX_RETRIES', 3)
         backoff = crawler.settings.getfloat('RETRY_BACKOFF_FACTOR', 1.5)
         priority = crawler.settings.getint('RETRY_PRIORITY_ADJUST', -1)
+        retry_timeout = crawler.settings.getfloat('RETRY_DOWNLOAD_TIMEOUT', 90)
         
         middleware = cls(
             max_retries=max_retries,
             backoff_factor=backoff,
-            priority_adjust=priority
+            priority_adjust=priority,
+            retry_download_timeout=retry_timeout
         )
         
         return middleware
@@ -289,7 +375,7 @@ class GracefulFailureRetryMiddleware:
             return self._retry_or_fail(request, f"Server error: {response.status}", spider)
             
         # Retry on empty responses (potential partial downloads)
-        if len(response.body) < 100 and response.status == 200:
+        if response.status == 200 and len(response.body) < 100:
             return self._retry_or_fail(request, "Empty response body", spider)
             
         return response
@@ -301,10 +387,12 @@ class GracefulFailureRetryMiddleware:
             return None
             
         # Get exception details
-        error_msg = f"Error: {type(exception).__name__} - {str(exception)}"
-        return self._retry_or_fail(request, error_msg, spider)
+        error_name = type(exception).__name__
+        error_msg = f"Error: {error_name} - {str(exception)}"
+        return self._retry_or_fail(request, error_msg, spider,
+                                   timed_out=isinstance(exception, self.TIMEOUT_ERRORS))
     
-    def _retry_or_fail(self, request, reason, spider):
+    def _retry_or_fail(self, request, reason, spider, timed_out=False):
         """Retry a request or fail gracefully if max retries exceeded."""
         # Get current retry count
         retry_count = request.meta.get('retry_count', 0)
@@ -314,18 +402,27 @@ class GracefulFailureRetryMiddleware:
             retry_count += 1
             logger.info(f"Retrying {request.url} (attempt {retry_count}/{self.max_retries}) - {reason}")
             
-            # Create new request with increased retry count
-            new_request = request.copy()
-            new_request.meta['retry_count'] = retry_count
-            new_request.meta['retry_reason'] = reason
-            new_request.dont_filter = True
-            
             # Add backoff time based on retry count
             backoff_time = self.backoff_factor ** (retry_count - 1)
-            new_request.meta['retry_backoff'] = backoff_time
             
-            # Adjust priority
-            new_request.priority = request.priority + self.priority_adjust
+            meta = {
+                **request.meta,
+                'retry_count': retry_count,
+                'retry_reason': reason,
+                'retry_backoff': backoff_time
+            }
+            # Only a host that timed out gets the longer window; it may be
+            # slow but alive, while dead ones keep failing fast
+            if timed_out:
+                meta['download_timeout'] = self.retry_download_timeout
+            
+            # Create new request with increased retry count and adjusted
+            # priority, in one pass
+            new_request = request.replace(
+                meta=meta,
+                dont_filter=True,
+                priority=request.priority + self.priority_adjust
+            )
             
             # Log the retry
             spider.crawler.stats.inc_value(f'retry/count/{retry_count}')
@@ -340,9 +437,12 @@ class GracefulFailureRetryMiddleware:
             # Log failure to spider stats
             failed_url = request.url
             spider.crawler.stats.inc_value('failed_urls')
-            if not hasattr(spider, 'failed_urls'):
-                spider.failed_urls = []
-            spider.failed_urls.append((failed_url, reason))
+            if hasattr(spider, 'record_failure'):
+                spider.record_failure(failed_url, reason)
+            else:
+                if not hasattr(spider, 'failed_urls'):
+                    spider.failed_urls = deque(maxlen=10000)
+                spider.failed_urls.append((failed_url, reason))
             
             # Skip this URL
             raise IgnoreRequest(f"Max retries exceeded for {failed_url}")
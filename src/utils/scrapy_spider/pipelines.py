@@ -14,12 +14,23 @@ import logging
 import time
 import os
 import hashlib
+import multiprocessing
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional, Any, Union
 import re
 
 from scrapy.exceptions import DropItem
+from twisted.internet import defer, task, threads
+from twisted.python.failure import Failure
+import numpy as np
 import lxml.html
 from lxml.html.clean import Cleaner
+from w3lib.encoding import html_body_declared_encoding, read_bom
 
 # Import readability for content extraction
 try:
@@ -31,34 +42,394 @@ except ImportError:
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Whitespace (as understood by str.split()) other than a lone space.
+# Substituting ' ' for it collapses every run to one space like r'\s+'
+# does, but finds no match in already-normalized text, so re.sub hands
+# back the original string instead of building a copy of the page
+_WHITESPACE_RE = re.compile(r'\s{2,}|[^\S ]')
+
+# Markup tags, stripped by html_to_text's fallback when lxml can't parse a page
+_TAG_RE = re.compile(r'<[^>]+>')
+
+@lru_cache(maxsize=8192)
+def source_url_hash(url: str) -> str:
+    """
+    Deterministic ID for a source URL, stored as `source_url_hash` metadata.
+    
+    The digest is persisted in ChromaDB and used for de-duplication, so the
+    algorithm must stay stable across releases.
+    """
+    return hashlib.sha256(url.encode()).hexdigest()
+
+def content_hash(chunks: List[str]) -> str:
+    """
+    Fingerprint of a page's chunked text, stored as `content_hash` metadata.
+    
+    Mirrors of the same document on different URLs chunk identically, so
+    their embeddings can be reused instead of recomputed.
+    """
+    return hashlib.blake2b("\n".join(chunks).encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+# Set bits in each byte value, for Hamming distances between fingerprints
+_POPCOUNT_8 = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of a text's overlapping word triples.
+    
+    Pages that differ only by small edits (mirror banners, session ids,
+    timestamps) get fingerprints a few bits apart, see hamming_distances.
+    """
+    words = text.split()
+    shingles = [' '.join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))]
+    hashes = np.fromiter(
+        (hashlib.blake2b(shingle.encode('utf-8', 'surrogatepass'), digest_size=8).digest() for shingle in shingles),
+        dtype='V8', count=len(shingles)
+    )
+    # Each fingerprint bit is set when most shingle hashes have it set
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(majority, bitorder='little').view('<u8')[0])
+
+def hamming_distances(fingerprints: np.ndarray, fingerprint: int) -> np.ndarray:
+    """Number of differing bits between each of an array of uint64 fingerprints and one more."""
+    differing = np.bitwise_xor(fingerprints, np.uint64(fingerprint)).astype('<u8')
+    return _POPCOUNT_8[differing.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Split text into chunks of approximately chunk_size tokens with overlap.
+    
+    A simple approximation: average English word is ~5 characters
+    and ~4.7 words per token.
+    """
+    # Collapse whitespace runs to single spaces (same word boundaries as
+    # str.split; a no-op on text from html_to_text) and locate words by
+    # their space offsets in the UTF-8 bytes, rather than materializing and
+    # re-joining a list of every word
+    normalized = _WHITESPACE_RE.sub(' ', text).strip().encode('utf-8', 'surrogatepass')
+    if not normalized:
+        return []
+    
+    # Estimate words per chunk
+    words_per_chunk = chunk_size // 5
+    words_overlap = chunk_overlap // 5
+    
+    spaces = np.flatnonzero(np.frombuffer(normalized, dtype=np.uint8) == 0x20)
+    word_starts = np.concatenate(([0], spaces + 1))
+    word_ends = np.concatenate((spaces, [len(normalized)]))
+    
+    first = np.arange(0, len(word_starts), words_per_chunk - words_overlap)
+    last = np.minimum(first + words_per_chunk, len(word_starts)) - 1
+    
+    # Chunks always end on a space, so every slice is valid UTF-8
+    return [
+        normalized[start:end].decode('utf-8', 'surrogatepass')
+        for start, end in zip(word_starts[first].tolist(), word_ends[last].tolist())
+    ]
+
+@lru_cache(maxsize=None)
+def load_embedding_model(model_name: str, backend: str = "torch", model_file: Optional[str] = None,
+                         num_threads: int = 0):
+    """
+    Load a SentenceTransformer model once per process, warmed up with a
+    dummy batch.
+    
+    With the default "torch" backend the model is placed on the GPU in half
+    precision when CUDA is available, on Apple's MPS device when that is
+    available, and otherwise runs on the CPU in full precision. The "onnx"
+    and "openvino" backends run an exported, graph optimized copy of the
+    model instead (sentence-transformers >= 3.2); `model_file` selects a
+    specific export from the model repository, such as a quantized
+    "onnx/model_qint8_avx512_vnni.onnx".
+    
+    A positive `num_threads` sets the number of intra-op threads used for CPU
+    inference, by PyTorch or by the ONNX Runtime / OpenVINO session; 0 keeps
+    each runtime's default.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    if torch.cuda.is_available():
+        device = "cuda"
+    elif backend == "torch" and torch.backends.mps.is_available():
+        device = "mps"
+    else:
+        device = "cpu"
+    
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    
+    if backend == "torch":
+        model = SentenceTransformer(model_name, device=device)
+        if device == "cuda":
+            model.half()
+    else:
+        model_kwargs = {}
+        if model_file:
+            model_kwargs["file_name"] = model_file
+        if backend == "onnx":
+            model_kwargs["provider"] = "CUDAExecutionProvider" if device == "cuda" else "CPUExecutionProvider"
+            if num_threads > 0:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = num_threads
+                model_kwargs["session_options"] = session_options
+        elif backend == "openvino" and num_threads > 0:
+            model_kwargs["ov_config"] = {"INFERENCE_NUM_THREADS": num_threads}
+        model = SentenceTransformer(model_name, device=device, backend=backend, model_kwargs=model_kwargs)
+    
+    # Run one tiny batch so kernel selection and allocator warm-up happen
+    # here rather than on the first real embed pass
+    model.encode(["warmup", "warmup"], batch_size=2, show_progress_bar=False)
+    
+    logger.info(f"Loaded embedding model {model_name} on {device} ({backend} backend)")
+    return model
+
+# Cleaner to remove scripts, styles, etc. before text extraction
+_TEXT_CLEANER = Cleaner(
+    scripts=True,
+    javascript=True,
+    style=True,
+    inline_style=True,
+    links=True,
+    meta=True,
+    page_structure=False,
+    processing_instructions=True,
+    embedded=True,
+    frames=True,
+    forms=True,
+    annoying_tags=True,
+    remove_unknown_tags=True
+)
+
+# lxml parsers hold a lock while parsing, so pages parsed on several reactor
+# pool threads each use their thread's own parser
+_parsers = threading.local()
+
+def html_parser(encoding: Optional[str] = None) -> lxml.html.HTMLParser:
+    """
+    HTML parser for the current thread, created on first use.
+    
+    Comments are dropped while parsing, which saves the cleaners a pass, and
+    id attributes are not indexed since nothing looks elements up by id.
+    
+    Args:
+        encoding: Encoding of the bytes to be parsed (None for str input);
+            each encoding gets its own parser
+    """
+    parsers = getattr(_parsers, 'by_encoding', None)
+    if parsers is None:
+        parsers = _parsers.by_encoding = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = lxml.html.HTMLParser(
+            encoding=encoding, remove_comments=True, collect_ids=False
+        )
+    return parser
+
+def body_encoding(body: bytes) -> str:
+    """
+    Encoding of a body whose Content-Type declares none, found the way Scrapy
+    would: a BOM or <meta> declaration, else UTF-8 if it decodes as such,
+    else cp1252. Done here rather than by the spider, off the reactor thread.
+    """
+    encoding = read_bom(body)[0] or html_body_declared_encoding(body)
+    if encoding:
+        return encoding
+    try:
+        body.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def decode_html(html: Union[str, bytes], encoding: Optional[str] = None) -> str:
+    """Decode a raw response body with its encoding (detected if unknown); str is returned as is."""
+    if isinstance(html, bytes):
+        return html.decode(encoding or body_encoding(html), errors='replace')
+    return html
+
+def html_to_text(html_content: str) -> str:
+    """Convert HTML to plain text by stripping tags."""
+    try:
+        # Parse HTML
+        doc = lxml.html.fromstring(html_content, parser=html_parser())
+        
+        # Apply cleaner
+        doc = _TEXT_CLEANER.clean_html(doc)
+        
+        # Join every text node with a space and normalize whitespace.
+        # itertext() walks the tree in C; text_content() would be simpler
+        # but glues the last word of one block to the first of the next
+        text = ' '.join(doc.itertext())
+        text = _WHITESPACE_RE.sub(' ', text).strip()
+        
+        return text
+        
+    except Exception as e:
+        logger.error(f"Error converting HTML to text: {e}")
+        
+        # Very basic fallback
+        text = _TAG_RE.sub(' ', html_content)
+        text = _WHITESPACE_RE.sub(' ', text).strip()
+        
+        return text
+
+# Pages shorter than this (in bytes) skip readability: there is little
+# boilerplate to strip, and scoring costs more than it saves
+READABILITY_MIN_LENGTH = 2048
+
+def extract_content(html: Union[str, bytes], encoding: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract title, main content and plain text from a page with readability.
+    
+    Kept free of pipeline state so it can run in a worker process, which
+    then also does the decoding of a raw body.
+    
+    Returns:
+        Dict of item fields to set
+    """
+    html = decode_html(html, encoding)
+    try:
+        # Parse with readability
+        doc = Document(html)
+        
+        # Extract title and main content; summary() re-runs the whole
+        # readability scoring pass, so call it only once
+        summary = doc.summary()
+        return {
+            'title': doc.title(),
+            'content': summary,
+            'text': html_to_text(summary),
+            'readability_score': getattr(doc, 'score', 0)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error extracting content: {e}")
+        
+        # Fallback to simple extraction if readability fails
+        return {
+            'content': html,
+            'text': html_to_text(html),
+            'readability_score': 0,
+            'extraction_error': str(e)
+        }
+
+def parse_pool_context():
+    """
+    Multiprocessing context for parse worker processes.
+    
+    Workers never fork the crawler itself: it runs the reactor's thread pool
+    and the embedding threads, and a forked child could inherit one of their
+    locks held. A fork server (preloaded with this module, so workers start
+    with lxml and readability imported) is used where available, otherwise
+    each worker starts a fresh interpreter.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+# The sanitization and extraction pipelines share one pool of parse workers,
+# started by whichever opens first and stopped when both have closed
+_parse_pool = None
+_parse_pool_users = 0
+_parse_pool_lock = threading.Lock()
+
+def acquire_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Take a reference to the shared parse worker pool, starting it if needed."""
+    global _parse_pool, _parse_pool_users
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=parse_pool_context())
+        _parse_pool_users += 1
+        return _parse_pool
+
+def release_parse_pool():
+    """Drop a reference to the shared parse worker pool, stopping it after the last user."""
+    global _parse_pool, _parse_pool_users
+    with _parse_pool_lock:
+        _parse_pool_users -= 1
+        if _parse_pool_users > 0 or _parse_pool is None:
+            return
+        pool, _parse_pool = _parse_pool, None
+    pool.shutdown(wait=True)
+
+def defer_future(future) -> defer.Deferred:
+    """
+    Deferred firing with the result of a concurrent.futures Future.
+    
+    The result is handed to the reactor from the executor's own callback, so
+    no reactor pool thread is tied up waiting on the worker.
+    """
+    from twisted.internet import reactor
+    
+    d = defer.Deferred()
+    
+    def done(future):
+        try:
+            result = future.result()
+        except BaseException:
+            reactor.callFromThread(d.errback, Failure())
+        else:
+            reactor.callFromThread(d.callback, result)
+    
+    future.add_done_callback(done)
+    return d
+
 class ContentExtractionPipeline:
     """
     Pipeline for extracting main article content from HTML documents
     using readability-lxml.
     """
     
-    def __init__(self):
-        """Initialize content extraction pipeline."""
+    def __init__(self, parse_workers=0):
+        """
+        Initialize content extraction pipeline.
+        
+        Args:
+            parse_workers: Size of the parse worker pool, shared with
+                sanitization, that runs extraction off the crawler's reactor
+                thread (0 extracts on the reactor's thread pool instead)
+        """
         self.readability_available = Document is not None
         if not self.readability_available:
             logger.error("ContentExtractionPipeline requires readability-lxml")
+        self.parse_workers = parse_workers
+        self._parse_pool = None
         logger.info("Content Extraction Pipeline initialized")
     
     @classmethod
     def from_crawler(cls, crawler):
         """Create pipeline from crawler settings."""
-        return cls()
+        return cls(parse_workers=crawler.settings.getint('PARSE_WORKERS', 0))
+    
+    def open_spider(self, spider):
+        """Join the shared parse worker pool."""
+        if self.readability_available and self.parse_workers > 0:
+            self._parse_pool = acquire_parse_pool(self.parse_workers)
+    
+    def close_spider(self, spider):
+        """Leave the shared parse worker pool."""
+        if self._parse_pool:
+            self._parse_pool = None
+            release_parse_pool()
     
     def process_item(self, item, spider):
         """
         Extract main article content from item's HTML.
         
+        Extraction runs in a worker process (or, without workers, on a
+        reactor pool thread) and a Deferred is returned, so the reactor
+        keeps fetching while pages are parsed.
+        
         Args:
             item: Scrapy item with HTML body
             spider: Current spider
             
         Returns:
-            Item with extracted content added
+            Item with extracted content added, or a Deferred firing with it
         """
         if not self.readability_available:
             # Skip processing if readability is not available
@@ -68,153 +439,178 @@ class ContentExtractionPipeline:
         html = item.get('html')
         if not html:
             raise DropItem("Item has no HTML content")
-            
-        try:
-            # Parse with readability
-            doc = Document(html)
-            
-            # Extract title and main content
-            item['title'] = doc.title()
-            item['content'] = doc.summary()
-            item['text'] = self._html_to_text(doc.summary())
-            
-            # Extract metadata
-            item['readability_score'] = getattr(doc, 'score', 0)
-            item['extraction_time'] = time.time()
-            
-            logger.debug(f"Extracted content from {item.get('url', 'unknown')}: {len(item['text'])} chars")
-            return item
-            
-        except Exception as e:
-            logger.error(f"Error extracting content: {e}")
-            
-            # Fallback to simple extraction if readability fails
-            item['content'] = html
-            item['text'] = self._html_to_text(html)
-            item['readability_score'] = 0
-            item['extraction_time'] = time.time()
-            item['extraction_error'] = str(e)
-            
-            return item
+        
+        encoding = item.get('encoding')
+        
+        # Short pages and non-HTML bodies only need their text
+        if len(html) < READABILITY_MIN_LENGTH or not self._is_html(item, html):
+            html = decode_html(html, encoding)
+            return self._apply(item, {
+                'content': html,
+                'text': html_to_text(html),
+                'readability_score': 0
+            })
+        
+        if not self._parse_pool:
+            d = threads.deferToThread(extract_content, html, encoding)
+            d.addCallback(lambda result: self._apply(item, result))
+            return d
+        
+        d = defer_future(self._parse_pool.submit(extract_content, html, encoding))
+        d.addCallback(lambda result: self._apply(item, result))
+        d.addErrback(self._extract_inline, item, html, encoding)
+        return d
     
-    def _html_to_text(self, html_content):
-        """Convert HTML to plain text by stripping tags."""
-        try:
-            # Parse HTML
-            doc = lxml.html.fromstring(html_content)
-            
-            # Create cleaner to remove scripts, styles, etc.
-            cleaner = Cleaner(
-                scripts=True,
-                javascript=True,
-                style=True,
-                inline_style=True,
-                links=True,
-                meta=True,
-                page_structure=False,
-                processing_instructions=True,
-                embedded=True,
-                frames=True,
-                forms=True,
-                annoying_tags=True,
-                remove_unknown_tags=True
-            )
-            
-            # Apply cleaner
-            doc = cleaner.clean_html(doc)
-            
-            # Extract text with proper spacing
-            text_parts = []
-            
-            # Process text nodes with their parent tags for better context
-            for element in doc.iter():
-                if element.text and element.text.strip():
-                    text_parts.append(element.text.strip())
-                if element.tail and element.tail.strip():
-                    text_parts.append(element.tail.strip())
-            
-            # Join with space and normalize whitespace
-            text = ' '.join(text_parts)
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            return text
-            
-        except Exception as e:
-            logger.error(f"Error converting HTML to text: {e}")
-            
-            # Very basic fallback
-            text = re.sub(r'<[^>]+>', ' ', html_content)
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            return text
+    @staticmethod
+    def _is_html(item, html):
+        """Check whether a body is HTML, by content type if the server sent one."""
+        content_type = item.get('content_type')
+        if content_type:
+            return 'html' in content_type.lower()
+        if isinstance(html, bytes):
+            return html.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<')
+        return html.lstrip('\ufeff \t\r\n').startswith('<')
+    
+    def _extract_inline(self, failure, item, html, encoding):
+        """Fall back to extracting in-process, on a reactor pool thread, if a worker failed."""
+        logger.error(f"Extraction worker failed, extracting inline: {failure.value}")
+        d = threads.deferToThread(extract_content, html, encoding)
+        d.addCallback(lambda result: self._apply(item, result))
+        return d
+    
+    def _apply(self, item, result):
+        """Copy extraction results onto the item."""
+        item.update(result)
+        
+        # Extract metadata
+        item['extraction_time'] = time.time()
+        
+        logger.debug(f"Extracted content from {item.get('url', 'unknown')}: {len(item['text'])} chars")
+        return item
+
+# Cleaner for the sanitized copy of each page's HTML
+_SANITIZE_CLEANER = Cleaner(
+    scripts=True,
+    javascript=True,
+    comments=True,
+    style=True,
+    inline_style=True,
+    links=True,
+    meta=True,
+    page_structure=False,
+    processing_instructions=True,
+    embedded=True,
+    frames=True,
+    forms=True,
+    annoying_tags=True,
+    remove_unknown_tags=True,
+    safe_attrs_only=True,
+    safe_attrs=frozenset(['src', 'alt', 'title', 'href', 'class'])
+)
+
+def sanitize_markup(html: Union[str, bytes], encoding: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Produce a sanitized copy of a page's HTML.
+    
+    Kept free of pipeline state so it can run in a worker process. A raw
+    body is handed to libxml2 as bytes, which decodes it while parsing.
+    
+    Returns:
+        Dict of item fields to set
+    """
+    try:
+        # Parse HTML
+        parser = None
+        if isinstance(html, bytes):
+            try:
+                parser = html_parser(encoding or body_encoding(html))
+            except LookupError:
+                # libxml2 does not know every Python codec name
+                html = decode_html(html, encoding)
+        doc = lxml.html.fromstring(html, parser=parser or html_parser())
+        
+        # Apply cleaner
+        clean_doc = _SANITIZE_CLEANER.clean_html(doc)
+        
+        # Convert back to string
+        return {'sanitized_html': lxml.html.tostring(clean_doc, encoding='unicode')}
+        
+    except Exception as e:
+        logger.error(f"Error sanitizing HTML: {e}")
+        return {'sanitized_html': '', 'sanitization_error': str(e)}
 
 class HTMLSanitizationPipeline:
     """
     Pipeline for sanitizing HTML to prevent XSS and other attacks.
     """
     
-    def __init__(self):
-        """Initialize HTML sanitization pipeline."""
-        self.cleaner = Cleaner(
-            scripts=True,
-            javascript=True,
-            comments=True,
-            style=True,
-            inline_style=True,
-            links=True,
-            meta=True,
-            page_structure=False,
-            processing_instructions=True,
-            embedded=True,
-            frames=True,
-            forms=True,
-            annoying_tags=True,
-            remove_unknown_tags=True,
-            safe_attrs_only=True,
-            safe_attrs=frozenset(['src', 'alt', 'title', 'href', 'class'])
-        )
+    def __init__(self, parse_workers=0):
+        """
+        Initialize HTML sanitization pipeline.
+        
+        Args:
+            parse_workers: Size of the parse worker pool, shared with
+                extraction, that sanitizes pages (0 sanitizes on the
+                reactor's thread pool instead)
+        """
+        self.parse_workers = parse_workers
+        self._parse_pool = None
         logger.info("HTML Sanitization Pipeline initialized")
     
     @classmethod
     def from_crawler(cls, crawler):
         """Create pipeline from crawler settings."""
-        return cls()
+        return cls(parse_workers=crawler.settings.getint('PARSE_WORKERS', 0))
+    
+    def open_spider(self, spider):
+        """Join the shared parse worker pool."""
+        if self.parse_workers > 0:
+            self._parse_pool = acquire_parse_pool(self.parse_workers)
+    
+    def close_spider(self, spider):
+        """Leave the shared parse worker pool."""
+        if self._parse_pool:
+            self._parse_pool = None
+            release_parse_pool()
     
     def process_item(self, item, spider):
         """
         Sanitize HTML content in item.
         
+        Parsing and cleaning run in a worker process (or, without workers,
+        on a reactor pool thread), so the reactor keeps fetching meanwhile.
+        
         Args:
             item: Scrapy item with HTML content
             spider: Current spider
             
         Returns:
-            Item with sanitized HTML
+            Deferred firing with the item with sanitized HTML
         """
         # Get HTML from item
         html = item.get('html')
         if not html:
             return item
-            
-        try:
-            # Parse HTML
-            doc = lxml.html.fromstring(html)
-            
-            # Apply cleaner
-            clean_doc = self.cleaner.clean_html(doc)
-            
-            # Convert back to string
-            item['sanitized_html'] = lxml.html.tostring(clean_doc, encoding='unicode')
-            
-            logger.debug(f"Sanitized HTML for {item.get('url', 'unknown')}")
-            return item
-            
-        except Exception as e:
-            logger.error(f"Error sanitizing HTML: {e}")
-            item['sanitized_html'] = ''
-            item['sanitization_error'] = str(e)
-            
-            return item
+        
+        encoding = item.get('encoding')
+        if not self._parse_pool:
+            d = threads.deferToThread(sanitize_markup, html, encoding)
+        else:
+            d = defer_future(self._parse_pool.submit(sanitize_markup, html, encoding))
+            d.addErrback(self._sanitize_in_thread, html, encoding)
+        d.addCallback(self._apply, item)
+        return d
+    
+    def _sanitize_in_thread(self, failure, html, encoding):
+        """Fall back to sanitizing on a reactor pool thread if a worker failed."""
+        logger.error(f"Sanitization worker failed, sanitizing in-process: {failure.value}")
+        return threads.deferToThread(sanitize_markup, html, encoding)
+    
+    def _apply(self, result, item):
+        """Copy sanitization results onto the item."""
+        item.update(result)
+        logger.debug(f"Sanitized HTML for {item.get('url', 'unknown')}")
+        return item
 
 class ContentChunkingPipeline:
     """
@@ -276,37 +672,25 @@ class ContentChunkingPipeline:
             return item
     
     def _chunk_text(self, text):
-        """
-        Split text into chunks of approximately chunk_size tokens with overlap.
-        
-        A simple approximation: average English word is ~5 characters
-        and ~4.7 words per token.
-        """
-        # Split into words
-        words = text.split()
-        if not words:
-            return []
-            
-        # Estimate words per chunk
-        words_per_chunk = self.chunk_size // 5
-        words_overlap = self.chunk_overlap // 5
-        
-        chunks = []
-        
-        # Create chunks with overlap
-        for i in range(0, len(words), words_per_chunk - words_overlap):
-            chunk = ' '.join(words[i:i + words_per_chunk])
-            if chunk:  # Ensure we don't add empty chunks
-                chunks.append(chunk)
-                
-        return chunks
+        """Split text into overlapping chunks using the configured sizes."""
+        return chunk_text(text, self.chunk_size, self.chunk_overlap)
+
+# HNSW parameters for newly created collections. Crawls add chunks in bulk;
+# a larger brute-force buffer and sync threshold (defaults 100 and 1000)
+# mean Chroma folds new vectors into the index and saves the index to disk
+# far less often. Unsynced vectors are still in Chroma's write-ahead queue
+HNSW_BULK_METADATA = {"hnsw:batch_size": 1000, "hnsw:sync_threshold": 10000}
 
 class ChromaDBStoragePipeline:
     """
     Pipeline for storing extracted content in ChromaDB.
     """
     
-    def __init__(self, chroma_db_path, collection_name, model_name):
+    def __init__(self, chroma_db_path, collection_name, model_name,
+                 embedding_backend="torch", embedding_model_file=None,
+                 embedding_batch_size=64, flush_chunks=256, flush_interval=2.0, write_batch_size=200,
+                 embedding_cache_size=50000, unsafe_bulk=False, embedding_threads=0,
+                 near_duplicate_distance=0):
         """
         Initialize ChromaDB storage pipeline.
         
@@ -314,13 +698,77 @@ class ChromaDBStoragePipeline:
             chroma_db_path: Path to ChromaDB database
             collection_name: Name of collection to store data
             model_name: Name of embedding model to use
+            embedding_backend: SentenceTransformer backend ("torch", "onnx"
+                or "openvino")
+            embedding_model_file: Optional ONNX/OpenVINO file within the model
+                repository, e.g. a quantized export
+            embedding_batch_size: Batch size passed to the embedding model
+            flush_chunks: Number of buffered chunks (across items) that triggers
+                an embed pass
+            flush_interval: Seconds after which buffered items are embedded
+                even if fewer than flush_chunks have arrived (0 waits for
+                flush_chunks or the end of the crawl)
+            write_batch_size: Number of embedded chunks written per
+                collection.add call
+            embedding_cache_size: Number of recently embedded chunk texts whose
+                vectors are kept in memory for reuse (0 disables the cache)
+            unsafe_bulk: Relax SQLite durability on the writer connection for
+                faster bulk loads (a crash mid-run can lose recent writes)
+            embedding_threads: PyTorch CPU threads for the embedding model
+                (0 keeps the default)
+            near_duplicate_distance: Skip pages whose SimHash is within this
+                many bits of a page already stored during the crawl (0 keeps
+                every page)
         """
         self.chroma_db_path = chroma_db_path
         self.collection_name = collection_name
         self.model_name = model_name
+        self.embedding_backend = embedding_backend
+        self.embedding_model_file = embedding_model_file
+        self.embedding_batch_size = embedding_batch_size
+        self.flush_chunks = flush_chunks
+        self.flush_interval = flush_interval
+        self.write_batch_size = write_batch_size
+        self.embedding_cache_size = embedding_cache_size
+        self.unsafe_bulk = unsafe_bulk
+        self.embedding_threads = embedding_threads
+        self.near_duplicate_distance = near_duplicate_distance
         self.chroma_client = None
         self.collection = None
         self.model = None
+        self.stats = None
+        self.ndarray_embeddings = False
+        
+        # SimHash fingerprints of the pages accepted so far, filled from the
+        # front and doubled in size when full
+        self._fingerprints = np.empty(1024, dtype=np.uint64)
+        self._fingerprint_count = 0
+        
+        # (url, title, chunks) of pages waiting to be embedded together. The
+        # background threads get these copies and never touch the items,
+        # which later pipelines keep using
+        self._pending_pages = []
+        self._pending_chunks = 0
+        self._flush_timer = None
+        
+        # Chunk text digest -> float16 embedding, least recently used first.
+        # Shared navigation, footers and reposted text recur across many pages
+        self._embedding_cache = OrderedDict()
+        
+        # Embedded chunks waiting to be written together
+        self._write_buffer = self._new_write_buffer()
+        
+        # Page batches handed to the embedding thread; bounded so the crawl
+        # can't run arbitrarily far ahead of embedding
+        self._embed_q = queue.Queue(maxsize=2)
+        self._embedder = None
+        # Deferreds of batches waiting on a pool thread for room in _embed_q
+        self._queueing = set()
+        
+        # Batches handed to the background writer; bounded so embedding
+        # can't run arbitrarily far ahead of persistence
+        self._write_q = queue.Queue(maxsize=4)
+        self._writer = None
         logger.info(f"ChromaDB Storage Pipeline initialized")
     
     @classmethod
@@ -329,19 +777,39 @@ class ChromaDBStoragePipeline:
         chroma_db_path = crawler.settings.get('CHROMA_DB_PATH', './data/chroma_db')
         collection_name = crawler.settings.get('CHROMA_COLLECTION_NAME', 'dark_web_content')
         model_name = crawler.settings.get('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+        embedding_backend = crawler.settings.get('EMBEDDING_BACKEND', 'torch')
+        embedding_model_file = crawler.settings.get('EMBEDDING_MODEL_FILE')
+        embedding_batch_size = crawler.settings.getint('EMBEDDING_BATCH_SIZE', 64)
+        flush_chunks = crawler.settings.getint('EMBEDDING_FLUSH_CHUNKS', 256)
+        flush_interval = crawler.settings.getfloat('EMBEDDING_FLUSH_INTERVAL', 2.0)
+        write_batch_size = crawler.settings.getint('CHROMA_WRITE_BATCH_SIZE', 200)
+        embedding_cache_size = crawler.settings.getint('EMBEDDING_CACHE_SIZE', 50000)
+        unsafe_bulk = crawler.settings.getbool('CHROMA_UNSAFE_BULK', False)
+        embedding_threads = crawler.settings.getint('EMBEDDING_THREADS', 0)
+        near_duplicate_distance = crawler.settings.getint('NEAR_DUPLICATE_DISTANCE', 0)
         
         return cls(
             chroma_db_path=chroma_db_path,
             collection_name=collection_name,
-            model_name=model_name
+            model_name=model_name,
+            embedding_backend=embedding_backend,
+            embedding_model_file=embedding_model_file,
+            embedding_batch_size=embedding_batch_size,
+            flush_chunks=flush_chunks,
+            flush_interval=flush_interval,
+            write_batch_size=write_batch_size,
+            embedding_cache_size=embedding_cache_size,
+            unsafe_bulk=unsafe_bulk,
+            embedding_threads=embedding_threads,
+            near_duplicate_distance=near_duplicate_distance
         )
     
     def open_spider(self, spider):
         """Initialize ChromaDB and embedding model when spider opens."""
+        self.stats = spider.crawler.stats
         try:
             # Import required packages
             import chromadb
-            from sentence_transformers import SentenceTransformer
             
             # Create directory if it doesn't exist
             os.makedirs(self.chroma_db_path, exist_ok=True)
@@ -349,6 +817,10 @@ class ChromaDBStoragePipeline:
             # Initialize ChromaDB client
             self.chroma_client = chromadb.PersistentClient(path=self.chroma_db_path)
             
+            # Newer clients accept NumPy embeddings as-is; older ones need lists
+            chroma_version = tuple(int(part) for part in re.findall(r'\d+', chromadb.__version__)[:2])
+            self.ndarray_embeddings = chroma_version >= (0, 6)
+            
             # Get or create collection
             try:
                 self.collection = self.chroma_client.get_collection(self.collection_name)
@@ -356,14 +828,30 @@ class ChromaDBStoragePipeline:
             except Exception:
                 self.collection = self.chroma_client.create_collection(
                     name=self.collection_name,
-                    metadata={"description": "Dark Web content repository"}
+                    metadata={"description": "Dark Web content repository", **HNSW_BULK_METADATA}
                 )
                 logger.info(f"Created new ChromaDB collection: {self.collection_name}")
             
             # Initialize embedding model
-            self.model = SentenceTransformer(self.model_name)
+            self.model = load_embedding_model(
+                self.model_name, self.embedding_backend, self.embedding_model_file, self.embedding_threads
+            )
             logger.info(f"Initialized embedding model: {self.model_name}")
             
+            # Embed and persist batches off the crawl thread, so fetching,
+            # embedding and collection writes all overlap
+            self._writer = threading.Thread(target=self._writer_loop, name="chroma-writer", daemon=True)
+            self._writer.start()
+            self._embedder = threading.Thread(target=self._embedder_loop, name="chroma-embedder", daemon=True)
+            self._embedder.start()
+            
+            # On a slow crawl the buffer can take minutes to fill, so pages
+            # are also embedded on a timer instead of waiting for the chunk
+            # count or the end of the crawl
+            if self.flush_interval > 0:
+                self._flush_timer = task.LoopingCall(self._timed_flush)
+                self._flush_timer.start(self.flush_interval, now=False)
+            
         except ImportError as e:
             logger.error(f"Required package not available: {e}")
             self.chroma_client = None
@@ -377,19 +865,62 @@ class ChromaDBStoragePipeline:
             self.model = None
     
     def close_spider(self, spider):
-        """Close connections when spider closes."""
+        """
+        Flush buffered items and close connections when spider closes.
+        
+        Returns:
+            Deferred firing once everything buffered has been stored
+        """
+        if self._flush_timer and self._flush_timer.running:
+            self._flush_timer.stop()
+        self._flush_timer = None
+        
+        pages = self._pending_pages
+        self._pending_pages = []
+        self._pending_chunks = 0
+        
+        # Batches still waiting for room in the queue must get in ahead of
+        # the stop sentinel; draining blocks, so it runs on a pool thread
+        d = defer.DeferredList(list(self._queueing))
+        d.addCallback(lambda _: threads.deferToThread(self._shut_down, pages))
+        return d
+    
+    def _shut_down(self, pages):
+        """Embed and write the remaining pages, then stop the background threads."""
+        if self._embedder:
+            if pages:
+                self._embed_q.put(pages)
+            self._embed_q.put(None)
+            self._embedder.join()
+            self._embedder = None
+        self._write()
+        if self._writer:
+            self._write_q.put(None)
+            self._writer.join()
+            self._writer = None
         logger.info("Closing ChromaDB Storage Pipeline")
     
     def process_item(self, item, spider):
         """
-        Store item chunks in ChromaDB.
+        Buffer item chunks for storage in ChromaDB.
+        
+        Chunks from several items are embedded in a single model call once
+        the buffer reaches `flush_chunks` (or every `flush_interval`
+        seconds), so short pages don't each pay for their own tiny forward
+        pass. Embedding runs on a background thread,
+        so the reactor keeps downloading meanwhile.
+        
+        The item's storage fields record the hand-off and are set here, on
+        the reactor thread; the background threads only see a copy of the
+        page, and log and count (under chroma/chunks_failed) any failure.
         
         Args:
             item: Scrapy item with chunks
             spider: Current spider
             
         Returns:
-            Item (unchanged)
+            Item with storage fields added, or a Deferred firing with it
+            once a full embedding queue has taken the buffered batch
         """
         # Skip if not initialized properly
         if not self.chroma_client or not self.collection or not self.model:
@@ -400,55 +931,312 @@ class ChromaDBStoragePipeline:
         chunks = item.get('chunks')
         if not chunks:
             return item
-            
-        url = item.get('url', 'unknown')
-        title = item.get('title', 'Untitled')
+        
+        # Mirrors and lightly edited copies would only add near-identical
+        # vectors, so they are dropped before the embedding step
+        if self.near_duplicate_distance and self._is_near_duplicate(item.get('text') or ' '.join(chunks)):
+            logger.info(f"Skipping near-duplicate page {item.get('url', 'unknown')}")
+            item['near_duplicate'] = True
+            self.stats.inc_value('chroma/near_duplicates_skipped')
+            return item
+        
+        item['stored_chunks'] = len(chunks)
+        item['storage_timestamp'] = time.time()
+        self._pending_pages.append((item.get('url', 'unknown'), item.get('title', 'Untitled'), list(chunks)))
+        self._pending_chunks += len(chunks)
+        
+        if self._pending_chunks >= self.flush_chunks:
+            d = self._flush()
+            if d is not None:
+                # Scrapy holds back further items until this fires, which
+                # throttles the crawl to embedding speed
+                return d.addCallback(lambda _: item)
+        
+        return item
+    
+    def _is_near_duplicate(self, text):
+        """Check text against the pages seen so far, remembering it if it is new."""
+        fingerprint = simhash(text)
+        seen = self._fingerprints[:self._fingerprint_count]
+        if len(seen) and hamming_distances(seen, fingerprint).min() <= self.near_duplicate_distance:
+            return True
+        
+        if self._fingerprint_count == len(self._fingerprints):
+            self._fingerprints = np.concatenate((self._fingerprints, np.empty_like(self._fingerprints)))
+        self._fingerprints[self._fingerprint_count] = fingerprint
+        self._fingerprint_count += 1
+        return False
+    
+    @staticmethod
+    def _new_write_buffer():
+        """Create an empty column-wise buffer for collection.add."""
+        return {"ids": [], "embeddings": [], "metadatas": [], "documents": []}
+    
+    def _timed_flush(self):
+        """
+        Flush from the timer unless a batch is already waiting for the embedder.
+        
+        Returns:
+            The Deferred from _flush, if any; LoopingCall holds the next
+            tick until it fires
+        """
+        if self._queueing:
+            # The embedder is behind anyway; the buffer goes out with the
+            # next flush instead of parking another pool thread on the queue
+            return None
+        return self._flush()
+    
+    def _flush(self):
+        """
+        Hand all buffered pages to the embedding thread.
+        
+        Runs on the reactor thread, so it never blocks on the queue.
+        
+        Returns:
+            None if the batch was queued, or a Deferred firing once it is
+            if the embedder is behind and the queue was full
+        """
+        pages = self._pending_pages
+        if not pages:
+            return None
+        self._pending_pages = []
+        self._pending_chunks = 0
         
         try:
-            # Generate embeddings for all chunks
-            embeddings = self.model.encode(chunks)
+            self._embed_q.put_nowait(pages)
+            return None
+        except queue.Full:
+            pass
+        
+        # Wait for room on a pool thread; the reactor keeps running
+        d = threads.deferToThread(self._embed_q.put, pages)
+        self._queueing.add(d)
+        
+        def queued(result):
+            self._queueing.discard(d)
+            return result
+        
+        return d.addBoth(queued)
+    
+    def _embedder_loop(self):
+        """Embed queued page batches until a None sentinel arrives."""
+        while True:
+            pages = self._embed_q.get()
+            if pages is None:
+                break
+            try:
+                self._embed(pages)
+            except Exception as e:
+                logger.error(f"Error preparing chunks for ChromaDB: {e}")
+                self.stats.inc_value('chroma/chunks_failed', sum(len(chunks) for _, _, chunks in pages))
+    
+    def _embed(self, pages):
+        """Embed all chunks of (url, title, chunks) pages in one pass and queue them for writing."""
+        hashes = [content_hash(chunks) for _, _, chunks in pages]
+        
+        # Pages already stored under another URL, or repeated within this
+        # batch, reuse one set of embeddings instead of being encoded again
+        known = self._stored_embeddings(set(hashes))
+        new_pages = {}
+        for (_, _, chunks), digest in zip(pages, hashes):
+            if digest not in known:
+                new_pages.setdefault(digest, chunks)
+        
+        if new_pages:
+            try:
+                # Generate embeddings for the chunks of every new page at once.
+                # encode() sorts its input by length before batching and
+                # restores the order afterwards, so each mini-batch is padded
+                # only to its own longest chunk
+                all_chunks = [chunk for chunks in new_pages.values() for chunk in chunks]
+                embeddings = self._encode(all_chunks)
+            except Exception as e:
+                logger.error(f"Error embedding chunks: {e}")
+                self.stats.inc_value('chroma/chunks_failed', sum(len(chunks) for _, _, chunks in pages))
+                return
             
-            # Create a unique identifier for this URL
-            url_hash = hashlib.sha256(url.encode()).hexdigest()
+            offsets = np.cumsum([len(chunks) for chunks in new_pages.values()])[:-1]
+            known.update(zip(new_pages, np.split(embeddings, offsets)))
+        
+        reused = len(pages) - len(new_pages)
+        if reused:
+            logger.info(f"Reusing embeddings for {reused} duplicate pages")
+        
+        buffer = self._write_buffer
+        
+        timestamp = time.time()
+        for (url, title, chunks), digest in zip(pages, hashes):
+            total_chunks = len(chunks)
             
-            # Prepare data for batch insertion
-            ids = []
-            metadatas = []
-            documents = []
+            # Create a unique identifier for this URL
+            url_hash = source_url_hash(url)
             
-            # Process each chunk
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_id = f"{url_hash}_{idx}"
-                
-                metadata = {
+            # Every chunk of a page shares everything but its index
+            buffer["embeddings"].append(known[digest])
+            buffer["ids"].extend([f"{url_hash}_{idx}" for idx in range(total_chunks)])
+            buffer["metadatas"].extend([
+                {
                     "source_url_hash": url_hash,
+                    "content_hash": digest,
                     "title": title,
                     "chunk_index": idx,
-                    "total_chunks": len(chunks),
-                    "timestamp": time.time()
+                    "total_chunks": total_chunks,
+                    "timestamp": timestamp
                 }
-                
-                ids.append(chunk_id)
-                metadatas.append(metadata)
-                documents.append(chunk)
-            
-            # Add to collection in batch
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings.tolist(),
-                metadatas=metadatas,
-                documents=documents
+                for idx in range(total_chunks)
+            ])
+            buffer["documents"].extend(chunks)
+        
+        if len(buffer["ids"]) >= self.write_batch_size:
+            self._write()
+    
+    def _encode(self, chunks):
+        """Embed chunks, running the model once per distinct text not in the cache."""
+        # Without the LRU a per-call dict still collapses repeats (shared
+        # navigation, footers) within this pass
+        use_cache = self.embedding_cache_size > 0
+        cache = self._embedding_cache if use_cache else {}
+        keys = [hashlib.blake2b(chunk.encode('utf-8', 'surrogatepass'), digest_size=16).digest() for chunk in chunks]
+        missing = {}
+        for key, chunk in zip(keys, chunks):
+            if key not in cache:
+                missing.setdefault(key, chunk)
+        
+        fresh = {}
+        if missing:
+            vectors = self.model.encode(
+                list(missing.values()),
+                batch_size=self.embedding_batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            fresh = dict(zip(missing, vectors))
+            if use_cache:
+                for key, vector in fresh.items():
+                    # Cached as float16 (half the memory per entry, and a copy
+                    # so the row doesn't pin the whole batch array); only
+                    # later hits see the rounded vector
+                    cache[key] = vector.astype(np.float16)
+        
+        # Freshly encoded chunks keep the model's full float32 output
+        embeddings = np.stack(
+            [fresh[key] if key in fresh else cache[key] for key in keys]
+        ).astype(np.float32, copy=False)
+        
+        if use_cache:
+            # Refresh hits, then evict the least recently used entries
+            for key in keys:
+                cache.move_to_end(key)
+            while len(cache) > self.embedding_cache_size:
+                cache.popitem(last=False)
+        
+        return embeddings
+    
+    def _stored_embeddings(self, hashes):
+        """
+        Look up stored embeddings for pages with the given content hashes.
+        
+        Returns:
+            Dict mapping content hash to an array of chunk embeddings in
+            chunk order, for every hash whose chunks are all stored
+        """
+        if not hashes:
+            return {}
+        
+        try:
+            result = self.collection.get(
+                where={"content_hash": {"$in": list(hashes)}},
+                include=["metadatas", "embeddings"]
             )
+        except Exception as e:
+            logger.warning(f"Error looking up duplicate content: {e}")
+            return {}
+        
+        embeddings = result.get("embeddings")
+        if embeddings is None:
+            return {}
+        
+        # Several URLs may share a hash; any complete copy will do
+        found = {}
+        for metadata, embedding in zip(result["metadatas"], embeddings):
+            chunks = found.setdefault(metadata["content_hash"], [None] * metadata["total_chunks"])
+            chunks[metadata["chunk_index"]] = embedding
+        
+        return {
+            digest: np.asarray(chunks, dtype=np.float32)
+            for digest, chunks in found.items()
+            if all(chunk is not None for chunk in chunks)
+        }
+    
+    def _write(self):
+        """Hand all embedded chunks in the write buffer to the background writer."""
+        buffer = self._write_buffer
+        if not buffer["ids"]:
+            return
+        self._write_buffer = self._new_write_buffer()
+        
+        # Keep embeddings as one contiguous float32 array; only fall back
+        # to nested lists for clients that can't take arrays
+        embeddings = np.ascontiguousarray(np.concatenate(buffer["embeddings"]), dtype=np.float32)
+        
+        # A long page can leave far more than write_batch_size chunks in the
+        # buffer; queue them in bounded slices so no single collection.add
+        # has to serialize the whole lot, and writing starts on the first
+        # slice while later ones are still being prepared
+        for start in range(0, len(buffer["ids"]), self.write_batch_size):
+            end = start + self.write_batch_size
+            block = embeddings[start:end]
+            batch = {
+                "ids": buffer["ids"][start:end],
+                "embeddings": block if self.ndarray_embeddings else block.tolist(),
+                "metadatas": buffer["metadatas"][start:end],
+                "documents": buffer["documents"][start:end]
+            }
             
-            logger.info(f"Stored {len(chunks)} chunks for {url}")
+            # Blocks while the queue is full, throttling the crawl to write speed
+            self._write_q.put(batch)
+    
+    def _tune_sqlite(self):
+        """
+        Relax durability on this thread's connection to Chroma's SQLite store.
+        
+        Chroma hands out one SQLite connection per thread, so this has to run
+        on the writer thread. journal_mode is left alone because Chroma
+        relies on rollback when a write fails.
+        """
+        # The connection is reached through Chroma's private internals, which
+        # any release may move; without them the pragmas are simply skipped
+        try:
+            from chromadb.db.impl.sqlite import SqliteDB
             
-            # Add storage info to item
-            item['stored_chunks'] = len(chunks)
-            item['storage_timestamp'] = time.time()
+            conn = self.chroma_client._system.instance(SqliteDB)._conn_pool.connect()
+        except (AttributeError, ImportError) as e:
+            logger.warning(f"SQLite pragma tuning unavailable with this Chroma version: {e}")
+            return
+        
+        try:
+            for pragma in ("synchronous=OFF", "temp_store=MEMORY", "cache_size=-262144", "mmap_size=1073741824"):
+                conn.execute(f"PRAGMA {pragma}")
+            logger.info("Applied SQLite bulk-load pragmas to ChromaDB writer")
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite pragma tuning failed: {e}")
+    
+    def _writer_loop(self):
+        """Write queued batches with collection.add until a None sentinel arrives."""
+        if self.unsafe_bulk:
+            self._tune_sqlite()
+        
+        while True:
+            batch = self._write_q.get()
+            if batch is None:
+                break
             
-            return item
+            try:
+                self.collection.add(**batch)
+                
+                logger.info(f"Stored {len(batch['ids'])} chunks")
+                self.stats.inc_value('chroma/chunks_stored', len(batch['ids']))
             
-        except Exception as e:
-            logger.error(f"Error storing chunks in ChromaDB: {e}")
-            item['storage_error'] = str(e)
-            return item
+            except Exception as e:
+                logger.error(f"Error storing chunks in ChromaDB: {e}")
+                self.stats.inc_value('chroma/chunks_failed', len(batch['ids']))
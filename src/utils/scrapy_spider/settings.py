@@ -18,20 +18,39 @@ RANDOM_UA_TYPE = 'random'
 # Respect the robots.txt directives
 ROBOTSTXT_OBEY = False
 
-# Configure maximum concurrent requests
-CONCURRENT_REQUESTS = 8
-CONCURRENT_REQUESTS_PER_DOMAIN = 4
-CONCURRENT_REQUESTS_PER_IP = 4
+# Configure maximum concurrent requests; Tor latency, not bandwidth, is the
+# limit, so many requests in flight across different onion services pay off
+CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
+# Per-IP slots are off: DownloaderAwarePriorityQueue refuses to start with
+# them, and every onion service resolves through the same proxy anyway
+CONCURRENT_REQUESTS_PER_IP = 0
+
+# Schedule requests for the least busy download slots first, so one large
+# site can't fill the queue while other services sit idle
+SCHEDULER_PRIORITY_QUEUE = 'scrapy.pqueues.DownloaderAwarePriorityQueue'
+
+# Give up on slow name lookups (clearnet hosts; onions resolve through Tor)
+DNS_TIMEOUT = 30
+
+# Sanitization, extraction and circuit rotation wait on reactor pool
+# threads; the default pool of 10 would cap them well below CONCURRENT_REQUESTS
+REACTOR_THREADPOOL_MAXSIZE = 40
 
 # Enable and configure the AutoThrottle
 AUTOTHROTTLE_ENABLED = True
-AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 1
 AUTOTHROTTLE_MAX_DELAY = 60
-AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+AUTOTHROTTLE_TARGET_CONCURRENCY = 4.0
 AUTOTHROTTLE_DEBUG = False
 
 # Disable timeout middleware
-DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_TIMEOUT = 30
+RETRY_DOWNLOAD_TIMEOUT = 90  # Used instead when retrying a request that timed out
+
+# Abort responses larger than this before their body crosses the Tor link;
+# checked against Content-Length up front and while streaming
+DOWNLOAD_MAXSIZE = 10 * 1024 * 1024
 
 # Enable and configure Tor-specific middleware
 DOWNLOADER_MIDDLEWARES = {
@@ -59,6 +78,12 @@ SOCKS_PROXY = 'socks5://127.0.0.1:9050'
 TOR_SOCKS_HOST = '127.0.0.1'
 TOR_SOCKS_PORT = 9050
 
+# Keep connections to the proxy alive across requests
+DOWNLOAD_HANDLERS = {
+    'http': 'src.utils.scrapy_spider.handlers.PersistentProxyDownloadHandler',
+    'https': 'src.utils.scrapy_spider.handlers.PersistentProxyDownloadHandler',
+}
+
 # Tor control settings
 TOR_CONTROL_PORT = 9051
 TOR_CONTROL_PASSWORD = None  # Set from environment in production
@@ -70,14 +95,26 @@ TOR_RANDOM_ROTATION_CHANCE = 0.2
 # Content extraction settings
 CONTENT_CHUNK_SIZE = 1000
 CONTENT_CHUNK_OVERLAP = 200
+PARSE_WORKERS = 4  # processes shared by sanitization and readability extraction (0 = in the crawler process)
 
 # ChromaDB settings
 CHROMA_DB_PATH = './data/chroma_db'
 CHROMA_COLLECTION_NAME = 'dark_web_content'
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKEND = 'torch'  # or 'onnx' / 'openvino'
+EMBEDDING_MODEL_FILE = None  # e.g. 'onnx/model_qint8_avx512_vnni.onnx'
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_THREADS = 0  # CPU threads for encoding (0 = runtime default)
+EMBEDDING_FLUSH_CHUNKS = 256
+EMBEDDING_FLUSH_INTERVAL = 2.0  # seconds before a partly filled embed batch is flushed (0 = off)
+CHROMA_WRITE_BATCH_SIZE = 200
+EMBEDDING_CACHE_SIZE = 50000  # chunk embeddings kept in memory for reuse
+CHROMA_UNSAFE_BULK = False  # relax SQLite durability while writing
+NEAR_DUPLICATE_DISTANCE = 0  # skip pages within this many SimHash bits of one already stored (0 = off)
 
 # Log settings
 LOG_LEVEL = 'INFO'
+FAILED_URLS_LOG = None  # JSON-lines file that failed URLs beyond the in-memory cap are appended to
 
 # Retry settings
 RETRY_ENABLED = True
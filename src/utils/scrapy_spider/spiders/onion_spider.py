@@ -11,27 +11,61 @@ This spider implements:
 import logging
 import time
 import json
-from urllib.parse import urlparse
 import re
+from collections import Counter, deque
+from itertools import islice
 
 import scrapy
 from scrapy.exceptions import CloseSpider
 from scrapy.spidermiddlewares.httperror import HttpError
 from twisted.internet.error import DNSLookupError, TCPTimedOutError, TimeoutError
+from w3lib.encoding import http_content_type_encoding
+
+# orjson is optional; it parses large URL lists several times faster. Its
+# JSONDecodeError subclasses json.JSONDecodeError, so either can be caught
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Absolute URL whose host is a v2 (16 char) or v3 (56 char) base32 onion
+# address, optionally followed by further labels before the .onion suffix
+ONION_URL_RE = re.compile(
+    r'[A-Za-z][A-Za-z0-9+.-]*://(?:[a-z2-7]{56}|[a-z2-7]{16})(?:\.[^/?#]*)?\.onion(?:[/?#]|\Z)'
+)
+
+# Stats key and log label for each failure type handle_error distinguishes
+ERROR_KINDS = {
+    HttpError: ('error/http', 'HTTP error'),
+    DNSLookupError: ('error/dns', 'DNS lookup error'),
+    TimeoutError: ('error/timeout', 'Timeout error'),
+    TCPTimedOutError: ('error/timeout', 'Timeout error'),
+}
+# Newer Scrapy raises its own exception for a download timeout
+if hasattr(scrapy.exceptions, 'DownloadTimeoutError'):
+    ERROR_KINDS[scrapy.exceptions.DownloadTimeoutError] = ('error/timeout', 'Timeout error')
+
 class OnionSpider(scrapy.Spider):
     """Spider for crawling .onion sites through Tor."""
     
     name = "onion"
     
+    # Failed URLs kept in memory for the end-of-crawl summary; older ones are
+    # appended to FAILED_URLS_LOG (when set) or forgotten
+    MAX_FAILED_URLS = 10000
+    
     custom_settings = {
         # Crawl settings
         'ROBOTSTXT_OBEY': False,  # .onion sites often don't have robots.txt
-        'CONCURRENT_REQUESTS': 8,  # Limit concurrent requests
-        'DOWNLOAD_TIMEOUT': 60,   # Increased timeout for Tor
+        'CONCURRENT_REQUESTS': 32,  # Limit concurrent requests
+        'SCHEDULER_PRIORITY_QUEUE': 'scrapy.pqueues.DownloaderAwarePriorityQueue',  # Spread requests across sites
+        'CONCURRENT_REQUESTS_PER_IP': 0,  # Required by DownloaderAwarePriorityQueue
+        'DNS_TIMEOUT': 30,
+        'DOWNLOAD_TIMEOUT': 30,   # Dead onions fail fast; timed-out retries get longer
         'DOWNLOAD_DELAY': 2,      # Time between requests
         'RANDOMIZE_DOWNLOAD_DELAY': True,  # Add randomness to download delay
         
@@ -45,6 +79,12 @@ class OnionSpider(scrapy.Spider):
         'HTTP_PROXY': 'http://127.0.0.1:8118',  # Privoxy forwarding to Tor
         'HTTPS_PROXY': 'http://127.0.0.1:8118',
         
+        # Keep connections to the proxy alive across requests
+        'DOWNLOAD_HANDLERS': {
+            'http': 'src.utils.scrapy_spider.handlers.PersistentProxyDownloadHandler',
+            'https': 'src.utils.scrapy_spider.handlers.PersistentProxyDownloadHandler',
+        },
+        
         # Alternative direct Tor configuration
         'DOWNLOADER_MIDDLEWARES': {
             'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 110,
@@ -72,20 +112,27 @@ class OnionSpider(scrapy.Spider):
         Initialize the spider with URLs to crawl.
         
         Args:
-            urls: String of comma-separated URLs or JSON-encoded list of URLs
+            urls: List of URLs, or a string of comma-separated URLs or a
+                JSON-encoded list of URLs
             urls_file: Path to file containing URLs (JSON or one URL per line)
         """
         super(OnionSpider, self).__init__(*args, **kwargs)
         
         self.start_urls = []
-        self.failed_urls = []
+        self.failed_urls = deque(maxlen=self.MAX_FAILED_URLS)
+        self.failed_count = 0
+        self.error_counts = Counter()  # Added to the crawler stats on close
         self.start_time = time.time()
         
+        # Process URLs passed in directly
+        if isinstance(urls, (list, tuple)):
+            self.start_urls = list(urls)
+        
         # Process URLs from string
-        if urls:
+        elif urls:
             try:
                 # Try parsing as JSON
-                url_list = json.loads(urls)
+                url_list = json_loads(urls)
                 if isinstance(url_list, list):
                     self.start_urls = url_list
                 else:
@@ -98,56 +145,42 @@ class OnionSpider(scrapy.Spider):
         if urls_file:
             try:
                 with open(urls_file, 'r') as f:
-                    content = f.read().strip()
+                    # Only a file whose first non-blank character opens a
+                    # list can be JSON; anything else is streamed line by
+                    # line instead of being read into memory whole
+                    first = f.read(1)
+                    while first.isspace():
+                        first = f.read(1)
+                    f.seek(0)
                     
-                    # Try parsing as JSON
-                    if content.startswith('[') and content.endswith(']'):
+                    if first == '[':
                         try:
-                            url_list = json.loads(content)
+                            # Hand the parser the raw bytes; orjson works on
+                            # them directly, skipping a decode of the file
+                            url_list = json_loads(f.buffer.read())
                             if isinstance(url_list, list):
                                 self.start_urls.extend(url_list)
                         except json.JSONDecodeError:
                             # Not valid JSON, treat as line-separated
-                            lines = content.split('\n')
-                            self.start_urls.extend([line.strip() for line in lines if line.strip()])
+                            f.seek(0)
+                            self.start_urls.extend(filter(None, map(str.strip, f)))
                     else:
                         # Treat as line-separated
-                        lines = content.split('\n')
-                        self.start_urls.extend([line.strip() for line in lines if line.strip()])
+                        self.start_urls.extend(filter(None, map(str.strip, f)))
             except Exception as e:
                 logger.error(f"Error loading URLs from file: {e}")
         
-        # Filter to only .onion URLs
-        self.start_urls = [url.strip() for url in self.start_urls if self._is_valid_onion_url(url.strip())]
+        # Drop repeats (keeping first-seen order), then filter to only .onion
+        # URLs; each duplicate would otherwise cost a full Tor round trip
+        unique_urls = dict.fromkeys(url.strip() for url in self.start_urls if isinstance(url, str))
+        self.start_urls = [url for url in unique_urls if self._is_valid_onion_url(url)]
         
         if not self.start_urls:
             logger.warning("No valid .onion URLs provided")
     
     def _is_valid_onion_url(self, url):
         """Validate if a URL is a proper .onion address."""
-        try:
-            parsed = urlparse(url)
-            # Check if scheme is present
-            if not parsed.scheme or not parsed.netloc:
-                return False
-                
-            # Check if it's a .onion domain
-            if not parsed.netloc.endswith('.onion'):
-                return False
-                
-            # Check for valid onion address format (v2 or v3)
-            hostname = parsed.netloc.split('.')[0]
-            # V3 onion addresses are 56 chars, V2 are 16 chars
-            if len(hostname) not in (16, 56):
-                return False
-                
-            # Check for valid base32 chars (a-z2-7)
-            if not re.match(r'^[a-z2-7]+$', hostname):
-                return False
-                
-            return True
-        except Exception:
-            return False
+        return isinstance(url, str) and ONION_URL_RE.match(url) is not None
     
     def start_requests(self):
         """Generate initial requests for all start URLs."""
@@ -181,17 +214,30 @@ class OnionSpider(scrapy.Spider):
             logger.warning(f"Got status {response.status} for {response.url}")
             return
         
+        # Images, archives and other binary bodies have no text to index
+        if not isinstance(response, scrapy.http.TextResponse):
+            logger.debug(f"Skipping non-text response from {response.url}")
+            return
+        
         # Extract processing metrics
         request_time = time.time() - response.meta.get('start_time', self.start_time)
         logger.info(f"Processed {response.url} in {request_time:.2f}s")
         
-        # Create item with raw HTML
+        # Create item with raw HTML. The body is passed on undecoded with the
+        # encoding its Content-Type declares, if any; response.encoding would
+        # otherwise sniff the body here on the reactor thread, so the parsing
+        # pipelines detect and decode it off the reactor thread instead
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1')
         item = {
             'url': response.url,
             'original_url': response.meta.get('original_url', response.url),
             'status': response.status,
-            'html': response.text,
-            'headers': dict(response.headers),
+            'html': response.body,
+            'encoding': http_content_type_encoding(content_type),
+            'content_type': content_type,
+            # The response's own Headers (a dict subclass); nothing downstream
+            # mutates it, so it is shared rather than copied per page
+            'headers': response.headers,
             'crawl_time': time.time(),
             'request_time': request_time
         }
@@ -215,26 +261,47 @@ class OnionSpider(scrapy.Spider):
         request = failure.request
         url = request.url
         
+        # Look the error type up directly; its base classes are only consulted
+        # on a miss, so subclasses are still recognised
+        error = failure.value
+        kind = next((ERROR_KINDS[cls] for cls in type(error).__mro__ if cls in ERROR_KINDS), None)
+        
         # Log based on error type
-        if failure.check(HttpError):
-            response = failure.value.response
-            logger.error(f"HTTP Error {response.status} on {url}")
-            self.crawler.stats.inc_value(f'error/http/{response.status}')
+        if kind is None:
+            logger.error(f"Unknown error on {url}: {error}")
+            self.error_counts['error/unknown'] += 1
         
-        elif failure.check(DNSLookupError):
-            logger.error(f"DNS lookup error on {url}")
-            self.crawler.stats.inc_value('error/dns')
+        elif kind[0] == 'error/http':
+            status = error.response.status
+            logger.error(f"HTTP Error {status} on {url}")
+            self.error_counts[f'error/http/{status}'] += 1
         
-        elif failure.check(TimeoutError, TCPTimedOutError):
-            logger.error(f"Timeout error on {url}")
-            self.crawler.stats.inc_value('error/timeout')
-            
         else:
-            logger.error(f"Unknown error on {url}: {failure.value}")
-            self.crawler.stats.inc_value('error/unknown')
+            key, label = kind
+            logger.error(f"{label} on {url}")
+            self.error_counts[key] += 1
         
         # Track failed URL
-        self.failed_urls.append((url, str(failure.value)))
+        self.record_failure(url, str(error))
+    
+    def record_failure(self, url, reason):
+        """Remember a URL that could not be crawled."""
+        self.failed_count += 1
+        if len(self.failed_urls) == self.failed_urls.maxlen:
+            self._dump_failures()
+        self.failed_urls.append((url, reason))
+    
+    def _dump_failures(self):
+        """Append the failed URLs held in memory to FAILED_URLS_LOG, if set, and forget them."""
+        path = self.settings.get('FAILED_URLS_LOG') if hasattr(self, 'settings') else None
+        if not path:
+            return
+        try:
+            with open(path, 'a') as f:
+                f.writelines(json.dumps({'url': url, 'reason': reason}) + '\n' for url, reason in self.failed_urls)
+            self.failed_urls.clear()
+        except OSError as e:
+            logger.error(f"Error writing failed URLs to {path}: {e}")
     
     def closed(self, reason):
         """Handle spider close event."""
@@ -242,16 +309,22 @@ class OnionSpider(scrapy.Spider):
         end_time = time.time()
         crawl_duration = end_time - self.start_time
         
-        success_count = len(self.start_urls) - len(self.failed_urls)
+        success_count = len(self.start_urls) - self.failed_count
         
         logger.info(f"Spider closed: {reason}")
         logger.info(f"Crawled {success_count}/{len(self.start_urls)} URLs in {crawl_duration:.2f}s")
         
+        # Stats are dumped after this handler runs, so the totals still land
+        for key, count in self.error_counts.items():
+            self.crawler.stats.inc_value(key, count)
+        
         # Log failures if any
         if self.failed_urls:
-            logger.info(f"Failed URLs ({len(self.failed_urls)}):")
-            for url, reason in self.failed_urls[:10]:  # Limit to first 10
+            logger.info(f"Failed URLs ({self.failed_count}):")
+            for url, reason in islice(self.failed_urls, 10):  # Limit to first 10
                 logger.info(f"- {url}: {reason}")
             
-            if len(self.failed_urls) > 10:
-                logger.info(f"... and {len(self.failed_urls) - 10} more.")
+            if self.failed_count > 10:
+                logger.info(f"... and {self.failed_count - 10} more.")
+            
+            self._dump_failures()
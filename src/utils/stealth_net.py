@@ -18,18 +18,25 @@ Usage:
 """
 
 import os
+import re
+import atexit
 import time
 import random
 import socket
 import struct
 import logging
 import subprocess
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Union
 import requests
 from requests.adapters import HTTPAdapter
-from stem import Signal
-from stem.control import Controller
-from torpy.http.requests import TorRequests
+
+# stem, torpy and tls_client are imported where they are first needed, so
+# importing this module for its helpers doesn't load them
 
 # Configure logging with redaction
 logging.basicConfig(
@@ -45,14 +52,20 @@ REDACT_PATTERNS = [
     r'([0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5})'  # MAC addresses
 ]
 
+# All patterns share one replacement, so they are matched in a single pass
+_REDACT_RE = re.compile('|'.join(REDACT_PATTERNS))
+
 class RedactingFilter(logging.Filter):
     """Redacts sensitive information from logs"""
     def filter(self, record):
-        import re
         message = record.getMessage()
-        for pattern in REDACT_PATTERNS:
-            message = re.sub(pattern, '[REDACTED]', message)
+        # Every pattern contains a dot or a colon, so messages with neither
+        # skip the regex scan entirely
+        if '.' in message or ':' in message:
+            message = _REDACT_RE.sub('[REDACTED]', message)
         record.msg = message
+        # The arguments are already formatted into the message
+        record.args = ()
         return True
 
 logger.addFilter(RedactingFilter())
@@ -105,16 +118,30 @@ PLATFORMS = [
     "iPhone; CPU iPhone OS 16_6 like Mac OS X",
 ]
 
+# Two-way choices for the Sec-Fetch headers
+SEC_FETCH_DESTS = ("document", "empty")
+SEC_FETCH_MODES = ("navigate", "cors")
+SEC_FETCH_SITES = ("none", "same-origin")
+
+# Thresholds on 14 random bits for the optional DNT (30%) and
+# Connection (20%) headers
+_DNT_THRESHOLD = int(0.3 * (1 << 14))
+_KEEP_ALIVE_THRESHOLD = int(0.2 * (1 << 14))
+
 def generate_random_headers() -> Dict[str, str]:
     """Generate random HTTP headers to avoid fingerprinting"""
+    # Every choice below reads its own bit field of a single random draw:
+    # 16 bits each for the list indexes (the modulo bias is negligible),
+    # one bit per Sec-Fetch header and 14 bits per optional header
+    bits = random.getrandbits(64)
     headers = {
-        "User-Agent": random.choice(USER_AGENTS),
-        "Accept-Language": random.choice(ACCEPT_LANGUAGES),
+        "User-Agent": USER_AGENTS[(bits & 0xFFFF) % len(USER_AGENTS)],
+        "Accept-Language": ACCEPT_LANGUAGES[(bits >> 16 & 0xFFFF) % len(ACCEPT_LANGUAGES)],
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
         "Accept-Encoding": "gzip, deflate, br",
-        "Sec-Fetch-Dest": random.choice(["document", "empty"]),
-        "Sec-Fetch-Mode": random.choice(["navigate", "cors"]),
-        "Sec-Fetch-Site": random.choice(["none", "same-origin"]),
+        "Sec-Fetch-Dest": SEC_FETCH_DESTS[bits >> 32 & 1],
+        "Sec-Fetch-Mode": SEC_FETCH_MODES[bits >> 33 & 1],
+        "Sec-Fetch-Site": SEC_FETCH_SITES[bits >> 34 & 1],
         "Sec-Fetch-User": "?1",
         "Upgrade-Insecure-Requests": "1",
         "Pragma": "no-cache",
@@ -122,10 +149,10 @@ def generate_random_headers() -> Dict[str, str]:
     }
     
     # Add some entropy with random headers
-    if random.random() < 0.3:
+    if bits >> 35 & 0x3FFF < _DNT_THRESHOLD:
         headers["DNT"] = "1"
     
-    if random.random() < 0.2:
+    if bits >> 49 & 0x3FFF < _KEEP_ALIVE_THRESHOLD:
         headers["Connection"] = "keep-alive"
     
     return headers
@@ -134,20 +161,29 @@ def generate_random_headers() -> Dict[str, str]:
 # TLS Fingerprint Randomization
 # ===============================================================
 
-try:
-    import tls_client
-    TLS_CLIENT_AVAILABLE = True
-except ImportError:
-    logger.warning("tls_client not available. TLS fingerprint randomization disabled.")
-    TLS_CLIENT_AVAILABLE = False
+@lru_cache(maxsize=None)
+def load_tls_client():
+    """Import tls_client on first use; None if it is not installed"""
+    try:
+        import tls_client
+        return tls_client
+    except ImportError:
+        logger.warning("tls_client not available. TLS fingerprint randomization disabled.")
+        return None
 
 class TLSRandomizedAdapter(HTTPAdapter):
     """HTTP adapter that randomizes TLS parameters to avoid JA3 fingerprinting"""
     
+    # Idle tls_client sessions per client profile, shared by all adapters;
+    # building one sets up the whole profile, so they are reused
+    _session_pool = defaultdict(list)
+    _session_pool_lock = threading.Lock()
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        if not TLS_CLIENT_AVAILABLE:
+        self.tls_client = load_tls_client()
+        if self.tls_client is None:
             return
             
         # Select a randomized client profile for TLS
@@ -160,32 +196,32 @@ class TLSRandomizedAdapter(HTTPAdapter):
         logger.info(f"Using TLS profile: {self.tls_profile}")
         
     def send(self, request, **kwargs):
-        if not TLS_CLIENT_AVAILABLE:
+        if self.tls_client is None:
             return super().send(request, **kwargs)
             
         # Use tls_client instead of the default requests implementation
         try:
-            session = tls_client.Session(client_identifier=self.tls_profile)
-            
-            # Transfer headers from the request to our tls_client session
-            for header, value in request.headers.items():
-                session.headers[header] = value
+            session = self._acquire_session()
+            try:
+                # Execute the request using the appropriate method, with the
+                # request's headers passed along rather than set on the session
+                method = request.method.lower()
+                url = request.url
+                headers = dict(request.headers)
                 
-            # Execute the request using the appropriate method
-            method = request.method.lower()
-            url = request.url
-            
-            # Make the actual request with tls_client
-            if method == "get":
-                response = session.get(url, **kwargs)
-            elif method == "post":
-                response = session.post(url, data=request.body, **kwargs)
-            elif method == "put":
-                response = session.put(url, data=request.body, **kwargs)
-            elif method == "delete":
-                response = session.delete(url, **kwargs)
-            else:
-                return super().send(request, **kwargs)
+                # Make the actual request with tls_client
+                if method == "get":
+                    response = session.get(url, headers=headers, **kwargs)
+                elif method == "post":
+                    response = session.post(url, data=request.body, headers=headers, **kwargs)
+                elif method == "put":
+                    response = session.put(url, data=request.body, headers=headers, **kwargs)
+                elif method == "delete":
+                    response = session.delete(url, headers=headers, **kwargs)
+                else:
+                    return super().send(request, **kwargs)
+            finally:
+                self._release_session(session)
                 
             # Convert tls_client response to requests.Response
             requests_response = requests.Response()
@@ -199,6 +235,21 @@ class TLSRandomizedAdapter(HTTPAdapter):
         except Exception as e:
             logger.warning(f"TLS randomization failed, falling back to standard adapter: {e}")
             return super().send(request, **kwargs)
+    
+    def _acquire_session(self):
+        """Take an idle tls_client session for this adapter's profile, or build one"""
+        with self._session_pool_lock:
+            idle = self._session_pool[self.tls_profile]
+            if idle:
+                return idle.pop()
+        return self.tls_client.Session(client_identifier=self.tls_profile)
+    
+    def _release_session(self, session):
+        """Return a tls_client session to the pool for reuse"""
+        # Cookies would otherwise link unrelated requests to each other
+        session.cookies.clear()
+        with self._session_pool_lock:
+            self._session_pool[self.tls_profile].append(session)
 
 # ===============================================================
 # Multi-Hop Tor Circuit Management
@@ -214,6 +265,9 @@ class TorCircuitManager:
         self.last_rotation = 0
         # How often to rotate circuits (in seconds)
         self.rotation_interval = 30
+        # Authenticated control port connection, kept between rotations
+        self._controller = None
+        self._controller_lock = threading.Lock()
         
     def rotate_circuit(self) -> bool:
         """
@@ -226,20 +280,54 @@ class TorCircuitManager:
             logger.debug(f"Circuit rotation skipped (last rotation was {now - self.last_rotation:.2f}s ago)")
             return False
             
-        try:
-            with Controller.from_port(port=self.control_port) as controller:
+        from stem import Signal
+        
+        with self._controller_lock:
+            # A kept connection may have been dropped by Tor since the last
+            # rotation, so a failure is retried once on a fresh one
+            for attempt in range(2):
+                try:
+                    self._get_controller().signal(Signal.NEWNYM)
+                    self.last_rotation = now
+                    logger.info("Tor circuit successfully rotated")
+                    return True
+                except Exception as e:
+                    self._close_controller()
+                    if attempt:
+                        logger.error(f"Failed to rotate Tor circuit: {str(e)}")
+        return False
+    
+    def _get_controller(self):
+        """Get the control port connection, connecting and authenticating if needed"""
+        if self._controller is None or not self._controller.is_alive():
+            from stem.control import Controller
+            
+            self._close_controller()
+            controller = Controller.from_port(port=self.control_port)
+            try:
                 if self.password:
                     controller.authenticate(password=self.password)
                 else:
                     controller.authenticate()
-                    
-                controller.signal(Signal.NEWNYM)
-                self.last_rotation = now
-                logger.info("Tor circuit successfully rotated")
-                return True
-        except Exception as e:
-            logger.error(f"Failed to rotate Tor circuit: {str(e)}")
-            return False
+            except Exception:
+                controller.close()
+                raise
+            self._controller = controller
+        return self._controller
+    
+    def _close_controller(self):
+        """Close the control port connection, if open"""
+        if self._controller is not None:
+            try:
+                self._controller.close()
+            except Exception:
+                pass
+            self._controller = None
+    
+    def close(self):
+        """Close the control port connection"""
+        with self._controller_lock:
+            self._close_controller()
 
 # ===============================================================
 # I2P Fallback Transport
@@ -248,7 +336,7 @@ class TorCircuitManager:
 class I2PSession:
     """Wrapper for I2P HTTP requests as fallback for Tor"""
     
-    def __init__(self, i2p_http_proxy: str = "127.0.0.1:4444"):
+    def __init__(self, i2p_http_proxy: str = "127.0.0.1:4444", pool_maxsize: int = 32):
         self.i2p_http_proxy = i2p_http_proxy
         self.session = requests.Session()
         self.session.proxies = {
@@ -256,6 +344,13 @@ class I2PSession:
             "https": f"http://{i2p_http_proxy}"
         }
         
+        # Plain HTTP requests all share the proxy's connection pool, and
+        # HTTPS ones get a pool per tunnelled host; the default of 10 each
+        # makes concurrent fallback requests discard and reopen connections
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
     def request(self, method: str, url: str, **kwargs) -> requests.Response:
         """Make an HTTP request through I2P"""
         # Add randomized headers if not provided
@@ -277,6 +372,32 @@ class I2PSession:
 # Stealth Session - Main interface
 # ===============================================================
 
+class ResponseTooLarge(requests.RequestException):
+    """Raised when a response body exceeds the session's size limit"""
+
+def read_limited(response: requests.Response, max_bytes: int) -> requests.Response:
+    """
+    Read a streamed response body, aborting once it exceeds max_bytes
+    
+    The declared Content-Length is checked first so oversized bodies are
+    refused before any of them is transferred. The body is stored on the
+    response, so .content and .text work as usual afterwards.
+    """
+    declared = response.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        response.close()
+        raise ResponseTooLarge(f"Response declares {declared} bytes (limit {max_bytes})")
+    
+    body = bytearray()
+    for block in response.iter_content(chunk_size=65536):
+        body.extend(block)
+        if len(body) > max_bytes:
+            response.close()
+            raise ResponseTooLarge(f"Response exceeded {max_bytes} bytes")
+    
+    response._content = bytes(body)
+    return response
+
 class StealthSession:
     """
     Stealth HTTP session that routes through multi-hop Tor circuits with
@@ -293,12 +414,28 @@ class StealthSession:
         tor_password: str = None,
         i2p_http_proxy: str = "127.0.0.1:4444",
         max_retries: int = 3,
-        circuit_hops: int = 3
+        circuit_hops: int = 3,
+        pool_size: int = 4,
+        rotate_after: Optional[int] = None,
+        max_response_bytes: Optional[int] = None
     ):
         self.tor_socks_host = tor_socks_host
         self.tor_socks_port = tor_socks_port
         self.max_retries = max_retries
         self.circuit_hops = circuit_hops
+        self.pool_size = pool_size
+        self.rotate_after = rotate_after
+        self.max_response_bytes = max_response_bytes
+        
+        # Tor client and idle [session, exit stack, use count, Tor client]
+        # entries, created lazily. Each session keeps its own circuit and connection
+        # pool, so reusing them avoids paying for circuit setup and
+        # handshakes on every request; rotate_after bounds how many requests
+        # one circuit serves
+        self._tor_stack = None
+        self._tor_requests = None
+        self._idle_sessions = deque()
+        self._pool_lock = threading.Lock()
         
         # Initialize circuit manager
         self.circuit_manager = TorCircuitManager(
@@ -307,7 +444,7 @@ class StealthSession:
         )
         
         # Initialize I2P as fallback
-        self.i2p_session = I2PSession(i2p_http_proxy=i2p_http_proxy)
+        self.i2p_session = I2PSession(i2p_http_proxy=i2p_http_proxy, pool_maxsize=max(32, pool_size))
         
         logger.info(f"Stealth session initialized with {circuit_hops} Tor hops")
     
@@ -319,21 +456,20 @@ class StealthSession:
         use_i2p: bool = False,
         **kwargs
     ) -> requests.Response:
-        """Make a stealth request through Tor (default) or I2P"""
+        """
+        Make a stealth request through Tor (default) or I2P
         
-        # Use I2P if specified or if we've exceeded retry limit with Tor
-        if use_i2p or retry_count >= self.max_retries:
-            try:
-                return self.i2p_session.request(method, url, **kwargs)
-            except Exception as e:
-                logger.error(f"All transport methods failed. Request could not be completed: {str(e)}")
-                raise
+        Tor is tried until max_retries attempts (counting retry_count ones
+        already made) have failed, backing off exponentially with jitter
+        between attempts, then the request falls back to I2P.
+        """
         
-        # Otherwise use Tor (primary transport)
-        try:
-            # Rotate circuit before request
-            self.circuit_manager.rotate_circuit()
-            
+        # Stream bodies when they are size limited so oversized ones can be
+        # abandoned before the whole payload crosses the network
+        if self.max_response_bytes:
+            kwargs["stream"] = True
+        
+        if not use_i2p:
             # Add randomized headers if not provided
             if "headers" not in kwargs:
                 kwargs["headers"] = generate_random_headers()
@@ -342,22 +478,140 @@ class StealthSession:
             if "timeout" not in kwargs:
                 kwargs["timeout"] = 60
             
-            # Use TorRequests for Tor connectivity
-            with TorRequests(hops_count=self.circuit_hops) as tor_requests:
-                with tor_requests.get_session() as session:
-                    # Add TLS randomization if available
-                    if TLS_CLIENT_AVAILABLE:
-                        session.mount("https://", TLSRandomizedAdapter())
-                    
-                    logger.info(f"Making {method} request through Tor ({self.circuit_hops} hops)")
-                    return session.request(method, url, **kwargs)
-                    
+            for attempt in range(retry_count, self.max_retries):
+                try:
+                    return self._tor_request(method, url, **kwargs)
+                except ResponseTooLarge:
+                    # Retrying or falling back to I2P would fetch the same body again
+                    raise
+                except Exception as e:
+                    logger.warning(f"Tor request failed (attempt {attempt+1}/{self.max_retries}): {str(e)}")
+                    # Back off before retrying, with jitter so concurrent
+                    # requests don't all retry at once
+                    if attempt + 1 < self.max_retries:
+                        time.sleep(min(30, 2 ** attempt) + random.random())
+        
+        # Use I2P if specified or if every Tor attempt failed
+        try:
+            response = self.i2p_session.request(method, url, **kwargs)
+            if self.max_response_bytes:
+                read_limited(response, self.max_response_bytes)
+            return response
         except Exception as e:
-            logger.warning(f"Tor request failed (attempt {retry_count+1}/{self.max_retries}): {str(e)}")
-            # Sleep briefly to prevent rapid retries
-            time.sleep(2)
-            # Retry with Tor
-            return self.request(method, url, retry_count=retry_count+1, **kwargs)
+            logger.error(f"All transport methods failed. Request could not be completed: {str(e)}")
+            raise
+    
+    def _tor_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Make one request attempt through Tor"""
+        # Rotate circuit before request
+        self.circuit_manager.rotate_circuit()
+        
+        # Use a pooled Tor session; a failed one is closed so its circuit
+        # is not reused, and the Tor client is replaced in case its guard
+        # is what failed
+        entry = self._acquire_tor_session()
+        try:
+            logger.info(f"Making {method} request through Tor ({self.circuit_hops} hops)")
+            response = entry[0].request(method, url, **kwargs)
+            if self.max_response_bytes:
+                read_limited(response, self.max_response_bytes)
+        except ResponseTooLarge:
+            # The circuit is fine; only that response was abandoned
+            self._release_tor_session(entry)
+            raise
+        except Exception:
+            entry[1].close()
+            self._reset_tor_client(entry[3])
+            raise
+        self._release_tor_session(entry)
+        return response
+    
+    def _acquire_tor_session(self) -> list:
+        """Take an idle Tor session from the pool, or open a new one"""
+        while True:
+            try:
+                entry = self._idle_sessions.popleft()
+            except IndexError:
+                break
+            if entry[3] is self._tor_requests:
+                return entry
+            # Opened through a Tor client that has since been replaced
+            entry[1].close()
+        
+        # Opening the client and new circuits is serialized; requests on
+        # already-open sessions run concurrently
+        with self._pool_lock:
+            if self._tor_requests is None:
+                from torpy.http.requests import TorRequests
+                
+                self._tor_stack = ExitStack()
+                self._tor_requests = self._tor_stack.enter_context(TorRequests(hops_count=self.circuit_hops))
+            
+            tor_requests = self._tor_requests
+            stack = ExitStack()
+            session = stack.enter_context(tor_requests.get_session())
+        # Add TLS randomization if available
+        if load_tls_client() is not None:
+            session.mount("https://", TLSRandomizedAdapter())
+        return [session, stack, 0, tor_requests]
+    
+    def _reset_tor_client(self, tor_requests):
+        """Drop a Tor client and its guard, so the next session is opened through a fresh one"""
+        with self._pool_lock:
+            if self._tor_requests is not tor_requests:
+                # Already replaced after another failure
+                return
+            stack = self._tor_stack
+            self._tor_stack = None
+            self._tor_requests = None
+        # Idle sessions on the old client are closed as they come up
+        stack.close()
+    
+    def _release_tor_session(self, entry: list):
+        """Return a session to the back of the pool so sessions are used in turn"""
+        entry[2] += 1
+        if entry[3] is not self._tor_requests:
+            entry[1].close()
+        elif self.rotate_after and entry[2] >= self.rotate_after:
+            # Retire the circuit; a fresh session replaces it on demand
+            entry[1].close()
+        elif len(self._idle_sessions) < self.pool_size:
+            self._idle_sessions.append(entry)
+        else:
+            entry[1].close()
+    
+    def close(self):
+        """Close pooled Tor sessions, the underlying Tor client and the control port connection"""
+        while self._idle_sessions:
+            self._idle_sessions.popleft()[1].close()
+        if self._tor_stack is not None:
+            self._tor_stack.close()
+        self._tor_stack = None
+        self._tor_requests = None
+        self.circuit_manager.close()
+    
+    def fetch_many(
+        self,
+        urls: List[str],
+        method: str = "GET",
+        max_workers: Optional[int] = None,
+        **kwargs
+    ) -> List[Tuple[str, Optional[requests.Response]]]:
+        """
+        Request several URLs concurrently, one pooled Tor session per worker
+        
+        Returns: (url, response) pairs in input order; response is None for
+        URLs that failed on every transport
+        """
+        def fetch(url):
+            try:
+                return url, self.request(method, url, **kwargs)
+            except Exception as e:
+                logger.error(f"Request failed on all transports: {str(e)}")
+                return url, None
+        
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+            return list(executor.map(fetch, urls))
     
     # Convenience methods for common HTTP verbs
     def get(self, url: str, **kwargs) -> requests.Response:
@@ -376,6 +630,86 @@ class StealthSession:
 # Network Namespace Management
 # ===============================================================
 
+def random_interface_address() -> Tuple[str, str]:
+    """
+    Generate a random MAC address and private IP for a namespace interface
+    
+    Returns:
+        Tuple[str, str]: (MAC address, IP address with prefix length)
+    """
+    # One draw from the OS CSPRNG supplies every random byte: six for the
+    # MAC and three for the IP
+    rb = os.urandom(9)
+    
+    # Generate random MAC address (locally administered bit set, multicast bit clear)
+    mac = bytes(((rb[0] | 0x02) & 0xFE,)) + rb[1:6]
+    mac_addr = mac.hex(":")
+    
+    # Generate random private IP in 10.0.0.0/8 subnet; the last octet is
+    # scaled from 0-255 into 1-254
+    ip_addr = f"10.{rb[6]}.{rb[7]}.{((rb[8] * 254) >> 8) + 1}/24"
+    
+    return mac_addr, ip_addr
+
+# Every namespace routes through the same 10.0.0.1/24 host address, so one
+# MASQUERADE rule serves them all; it is added with the first namespace and
+# removed with the last instead of being appended and deleted for each.
+# The rule outlives the process that added it, so both ends check the host
+# rather than trusting this process's own bookkeeping
+_NAT_RULE = ["POSTROUTING", "-s", "10.0.0.0/24", "-o", "eth0", "-j", "MASQUERADE"]
+_nat_namespaces = set()
+_nat_lock = threading.Lock()
+_ip_forwarding_enabled = False
+
+def _enable_ip_forwarding():
+    """Turn on IPv4 forwarding on the host, if it isn't on already"""
+    global _ip_forwarding_enabled
+    if _ip_forwarding_enabled:
+        return
+    # Written directly rather than by running sysctl
+    with open("/proc/sys/net/ipv4/ip_forward", "r+") as f:
+        if f.read().strip() != "1":
+            f.seek(0)
+            f.write("1")
+    _ip_forwarding_enabled = True
+
+def _nat_rule_exists() -> bool:
+    """Check whether the MASQUERADE rule is installed on the host"""
+    result = subprocess.run(
+        ["iptables", "-t", "nat", "-C"] + _NAT_RULE,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return result.returncode == 0
+
+def _host_namespaces_left() -> bool:
+    """Check for host ends of namespace veth pairs, from this or any other process"""
+    result = subprocess.run(["ip", "-o", "link", "show", "type", "veth"], capture_output=True, text=True)
+    return any(
+        line.split(": ", 2)[1].startswith("veth0_")
+        for line in result.stdout.splitlines()
+        if line.count(": ") >= 2
+    )
+
+def _add_nat_user(name: str):
+    """Record a namespace using the NAT rule, adding the rule unless it is already there"""
+    with _nat_lock:
+        # An earlier process may have left the rule in place
+        if not _nat_namespaces and not _nat_rule_exists():
+            subprocess.run(["iptables", "-t", "nat", "-A"] + _NAT_RULE, check=True)
+        _nat_namespaces.add(name)
+
+def _remove_nat_user(name: str):
+    """Forget a namespace using the NAT rule, removing the rule once no namespace is left"""
+    with _nat_lock:
+        # The name may be unknown here, e.g. a namespace left over from a
+        # crashed process; it still counts towards removing the rule
+        _nat_namespaces.discard(name)
+        if _nat_namespaces or _host_namespaces_left():
+            return
+        # Also clears copies appended by older processes
+        while _nat_rule_exists():
+            subprocess.run(["iptables", "-t", "nat", "-D"] + _NAT_RULE, check=True)
+
 def create_network_namespace(name: str = "stealth_net") -> Tuple[str, str]:
     """
     Creates a network namespace with random MAC and IP address
@@ -384,109 +718,194 @@ def create_network_namespace(name: str = "stealth_net") -> Tuple[str, str]:
         Tuple[str, str]: (MAC address, IP address) of the created interface
     """
     try:
-        # Generate random MAC address (ensuring locally administered bit is set)
-        mac = [0x02]  # Locally administered MAC address
-        mac.extend([random.randint(0, 255) for _ in range(5)])
-        mac_addr = ":".join([f"{b:02x}" for b in mac])
-        
-        # Generate random private IP in 10.0.0.0/8 subnet
-        ip_addr = f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}/24"
+        mac_addr, ip_addr = random_interface_address()
         
         logger.info(f"Creating network namespace {name} with random MAC and IP")
         
-        # Create the namespace
-        subprocess.run(["ip", "netns", "add", name], check=True)
-        
-        # Create veth pair
-        subprocess.run(["ip", "link", "add", f"veth0_{name}", "type", "veth", "peer", "name", f"veth1_{name}"], check=True)
-        
-        # Move one end to namespace
-        subprocess.run(["ip", "link", "set", f"veth1_{name}", "netns", name], check=True)
-        
-        # Configure host end
-        subprocess.run(["ip", "addr", "add", f"10.0.0.1/24", "dev", f"veth0_{name}"], check=True)
-        subprocess.run(["ip", "link", "set", f"veth0_{name}", "up"], check=True)
-        
-        # Configure namespace end with random MAC and IP
-        subprocess.run(["ip", "netns", "exec", name, "ip", "link", "set", f"veth1_{name}", "address", mac_addr], check=True)
-        subprocess.run(["ip", "netns", "exec", name, "ip", "addr", "add", ip_addr, "dev", f"veth1_{name}"], check=True)
-        subprocess.run(["ip", "netns", "exec", name, "ip", "link", "set", f"veth1_{name}", "up"], check=True)
-        
-        # Set up loopback in namespace
-        subprocess.run(["ip", "netns", "exec", name, "ip", "link", "set", "lo", "up"], check=True)
-        
-        # Set up default route in namespace
-        subprocess.run(["ip", "netns", "exec", name, "ip", "route", "add", "default", "via", "10.0.0.1"], check=True)
-        
-        # Enable IP forwarding on host
-        subprocess.run(["sysctl", "-w", "net.ipv4.ip_forward=1"], check=True)
+        # Create the namespace and veth pair, move one end into the
+        # namespace and configure the host end, all in one ip process;
+        # -batch stops at the first failing command
+        host_batch = (
+            f"netns add {name}\n"
+            f"link add veth0_{name} type veth peer name veth1_{name}\n"
+            f"link set veth1_{name} netns {name}\n"
+            f"addr add 10.0.0.1/24 dev veth0_{name}\n"
+            f"link set veth0_{name} up\n"
+        )
+        subprocess.run(["ip", "-batch", "-"], input=host_batch, text=True, check=True)
+        
+        # Configure namespace end with random MAC and IP, bring up loopback
+        # and set the default route, in a second ip process that switches
+        # into the namespace once
+        ns_batch = (
+            f"link set veth1_{name} address {mac_addr}\n"
+            f"addr add {ip_addr} dev veth1_{name}\n"
+            f"link set veth1_{name} up\n"
+            "link set lo up\n"
+            "route add default via 10.0.0.1\n"
+        )
+        subprocess.run(["ip", "-netns", name, "-batch", "-"], input=ns_batch, text=True, check=True)
         
-        # Set up NAT
-        subprocess.run([
-            "iptables", "-t", "nat", "-A", "POSTROUTING", 
-            "-s", "10.0.0.0/24", "-o", "eth0", "-j", "MASQUERADE"
-        ], check=True)
+        # Enable IP forwarding and NAT on host (once for all namespaces)
+        _enable_ip_forwarding()
+        _add_nat_user(name)
         
         logger.info(f"Network namespace {name} created with MAC {mac_addr} and IP {ip_addr}")
         return mac_addr, ip_addr
         
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         logger.error(f"Failed to create network namespace: {e}")
         return None, None
 
 def cleanup_network_namespace(name: str = "stealth_net"):
     """Remove the network namespace and associated interfaces"""
     try:
-        # Remove veth pair (automatically removes both ends)
-        try:
-            subprocess.run(["ip", "link", "del", f"veth0_{name}"], check=True)
-        except subprocess.CalledProcessError:
-            pass  # Interface might already be gone
-        
-        # Remove namespace
-        subprocess.run(["ip", "netns", "del", name], check=True)
+        # Remove veth pair (automatically removes both ends) and the
+        # namespace in one ip process; -force carries on past a failed
+        # command, as the interface might already be gone
+        result = subprocess.run(
+            ["ip", "-force", "-batch", "-"],
+            input=f"link del veth0_{name}\nnetns del {name}\n",
+            text=True,
+            stderr=subprocess.PIPE
+        )
+        if result.returncode != 0:
+            logger.warning(f"Some namespace cleanup commands failed: {result.stderr.strip()}")
         
-        # Clean up NAT rule
-        try:
-            subprocess.run([
-                "iptables", "-t", "nat", "-D", "POSTROUTING", 
-                "-s", "10.0.0.0/24", "-o", "eth0", "-j", "MASQUERADE"
-            ], check=True)
-        except subprocess.CalledProcessError:
-            pass  # Rule might already be gone
+        # Clean up NAT rule once no namespace needs it
+        _remove_nat_user(name)
             
         logger.info(f"Network namespace {name} removed")
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         logger.error(f"Failed to clean up network namespace: {e}")
 
+# Namespaces kept for reuse once released. Creating and especially deleting
+# a namespace is slow and serialized in the kernel, so a released one gets a
+# new MAC and IP on its next lease instead of being torn down
+NETNS_POOL_SIZE = 4
+
+_idle_namespaces = deque()
+_namespace_lock = threading.Lock()
+
+def _new_namespace_name() -> str:
+    """
+    Name for a new namespace, random rather than counted from 0 so that it
+    doesn't collide with another process's namespaces or ones left behind
+    by a crash
+    """
+    while True:
+        # Short names keep veth0_<name> within the 15 character interface limit
+        name = f"sn{random.getrandbits(24):06x}"
+        if not os.path.exists(f"/var/run/netns/{name}"):
+            return name
+
+def _namespace_pool_limit() -> int:
+    """Pool size, capped by the kernel's per-user namespace limit"""
+    try:
+        with open("/proc/sys/user/max_net_namespaces") as f:
+            return min(NETNS_POOL_SIZE, int(f.read()))
+    except (OSError, ValueError):
+        return NETNS_POOL_SIZE
+
+def lease_network_namespace() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Take a network namespace with a fresh random MAC and IP address,
+    reusing a released one if there is one
+    
+    Returns:
+        Tuple: (namespace name, MAC address, IP address), all None on failure
+    """
+    with _namespace_lock:
+        name = _idle_namespaces.popleft() if _idle_namespaces else None
+    
+    if name is None:
+        name = _new_namespace_name()
+        mac_addr, ip_addr = create_network_namespace(name)
+        if mac_addr is None:
+            return None, None, None
+        return name, mac_addr, ip_addr
+    
+    mac_addr, ip_addr = random_interface_address()
+    # Removing the address also drops the default route through it
+    ns_batch = (
+        f"link set veth1_{name} down\n"
+        f"link set veth1_{name} address {mac_addr}\n"
+        f"addr flush dev veth1_{name}\n"
+        f"addr add {ip_addr} dev veth1_{name}\n"
+        f"link set veth1_{name} up\n"
+        "route replace default via 10.0.0.1\n"
+    )
+    try:
+        subprocess.run(["ip", "-netns", name, "-batch", "-"], input=ns_batch, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to re-address network namespace {name}: {e}")
+        cleanup_network_namespace(name)
+        return lease_network_namespace()
+    
+    logger.info(f"Network namespace {name} reused with MAC {mac_addr} and IP {ip_addr}")
+    return name, mac_addr, ip_addr
+
+def release_network_namespace(name: str):
+    """Return a leased namespace to the pool, removing it if the pool is full"""
+    try:
+        # Leave no trace of the old address while the namespace sits idle
+        subprocess.run(["ip", "-netns", name, "addr", "flush", "dev", f"veth1_{name}"], check=True)
+    except subprocess.CalledProcessError:
+        cleanup_network_namespace(name)
+        return
+    
+    with _namespace_lock:
+        if len(_idle_namespaces) < _namespace_pool_limit():
+            _idle_namespaces.append(name)
+            return
+    cleanup_network_namespace(name)
+
+@atexit.register
+def _remove_idle_namespaces():
+    """Remove pooled namespaces when the process exits"""
+    with _namespace_lock:
+        names = list(_idle_namespaces)
+        _idle_namespaces.clear()
+    for name in names:
+        cleanup_network_namespace(name)
+
 def run_in_namespace(namespace: str, command: List[str]) -> subprocess.CompletedProcess:
-    """Run a command in the specified namespace"""
-    cmd = ["ip", "netns", "exec", namespace] + command
+    """
+    Run a command in the specified namespace
+    
+    nsenter joins only the network namespace and execs the command, skipping
+    the mount namespace 'ip netns exec' sets up; so /etc/netns/<name>/ files
+    are not bind-mounted over /etc, which none of these namespaces use
+    """
+    cmd = ["nsenter", f"--net=/var/run/netns/{namespace}", "--"] + command
     return subprocess.run(cmd, check=True)
 
 # ===============================================================
 # Environment Jitter Functions
 # ===============================================================
 
+# Timezones and locales to pick from when randomizing the environment
+TIMEZONES = (
+    "UTC", "America/New_York", "Europe/London", "Asia/Tokyo", 
+    "Australia/Sydney", "Europe/Berlin", "America/Los_Angeles"
+)
+LOCALES = (
+    "en_US.UTF-8", "en_GB.UTF-8", "de_DE.UTF-8", 
+    "fr_FR.UTF-8", "es_ES.UTF-8", "ru_RU.UTF-8"
+)
+
 def randomize_environment_variables():
     """Set random environment variables to avoid fingerprinting"""
     # Randomize timezone
-    timezones = [
-        "UTC", "America/New_York", "Europe/London", "Asia/Tokyo", 
-        "Australia/Sydney", "Europe/Berlin", "America/Los_Angeles"
-    ]
-    os.environ["TZ"] = random.choice(timezones)
+    timezone = random.choice(TIMEZONES)
+    os.environ["TZ"] = timezone
     
     # Randomize locale settings
-    locales = [
-        "en_US.UTF-8", "en_GB.UTF-8", "de_DE.UTF-8", 
-        "fr_FR.UTF-8", "es_ES.UTF-8", "ru_RU.UTF-8"
-    ]
-    selected_locale = random.choice(locales)
+    selected_locale = random.choice(LOCALES)
     os.environ["LANG"] = selected_locale
     os.environ["LC_ALL"] = selected_locale
     
-    logger.info(f"Environment randomized: TZ={os.environ['TZ']}, LANG={os.environ['LANG']}")
+    logger.info("Environment randomized: TZ=%s, LANG=%s", timezone, selected_locale)
 
 def add_clock_skew(max_seconds: int = 30):
     """Add a random clock skew (requires root privileges)"""
@@ -500,13 +919,11 @@ def add_clock_skew(max_seconds: int = 30):
         # Calculate new time
         new_time = current_time + skew_seconds
         
-        # Format for date command (seconds since epoch)
-        date_cmd = ["date", "+%s", "-s", f"@{int(new_time)}"]
-        
-        subprocess.run(date_cmd, check=True)
+        # Set the clock directly with clock_settime(2) instead of running date
+        time.clock_settime(time.CLOCK_REALTIME, new_time)
         logger.info(f"Added clock skew of {skew_seconds} seconds")
         return True
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         logger.warning(f"Failed to add clock skew (may require root): {e}")
         return False
 
@@ -519,9 +936,10 @@ def main():
     # Randomize environment variables
     randomize_environment_variables()
     
-    # Create a network namespace (requires root)
+    # Lease a network namespace (requires root)
+    namespace = None
     try:
-        mac_addr, ip_addr = create_network_namespace()
+        namespace, mac_addr, ip_addr = lease_network_namespace()
         if mac_addr and ip_addr:
             logger.info(f"Created namespace with MAC {mac_addr} and IP {ip_addr}")
     except Exception as e:
@@ -545,10 +963,11 @@ def main():
         logger.error(f"Error testing Tor connection: {e}")
     
     # Clean up network namespace if we created one
-    try:
-        cleanup_network_namespace()
-    except Exception as e:
-        logger.warning(f"Could not clean up network namespace: {e}")
+    if namespace:
+        try:
+            release_network_namespace(namespace)
+        except Exception as e:
+            logger.warning(f"Could not clean up network namespace: {e}")
 
 if __name__ == "__main__":
     main()
@@ -8,10 +8,16 @@ using short-lived tokens with automatic renewal.
 """
 
 import os
+import re
 import json
+import random
+import threading
 import requests
 import logging
-from typing import Dict, Optional, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
 import time
 
 # Configure logging with redaction for sensitive values
@@ -21,40 +27,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger("vault_integration")
 
+# Words that mark a log message as possibly carrying a secret, matched in a
+# single case-insensitive pass
+_SENSITIVE_RE = re.compile(r"token|password|secret|key|credential", re.IGNORECASE)
+
 # Redact sensitive information in logs
 class SensitiveFilter(logging.Filter):
     def filter(self, record):
-        msg = record.getMessage()
         # Redact token and secret values
-        if any(x in msg.lower() for x in ["token", "password", "secret", "key", "credential"]):
+        if _SENSITIVE_RE.search(record.getMessage()):
             record.msg = "[REDACTED SENSITIVE INFORMATION]"
+            # The arguments belong to the replaced message
+            record.args = ()
         return True
 
 logger.addFilter(SensitiveFilter())
 
+# Connections kept open to Vault, and so also the most secrets fetched at once
+VAULT_POOL_SIZE = 4
+
+# Wait after a failed token renewal, doubling with each further failure
+# up to the maximum (seconds)
+RENEW_RETRY_MIN = 30
+RENEW_RETRY_MAX = 900
+
+# Shortest wait between renewals, however short the lease (seconds)
+RENEW_MIN_INTERVAL = 10
+
+# Environment fallbacks, read once at import
+_TOR_HOST_ENV = os.getenv("TOR_SOCKS_HOST", "tor")
+_TOR_PORT_ENV = os.getenv("TOR_SOCKS_PORT", "9050")
+_DB_PATH_ENV = os.getenv("CHROMA_DB_PATH", "/app/data/chroma_db")
+_COLLECTION_ENV = os.getenv("COLLECTION_NAME", "samgpt")
+_WEBHOOK_ENV = os.getenv("WEBHOOK_URL")
+
 class VaultClient:
     """Client for interacting with HashiCorp Vault"""
     
     def __init__(self):
         """Initialize the Vault client with environment-based configuration"""
         self.vault_addr = os.getenv("VAULT_ADDR", "http://vault:8200")
+        # Prefix of every API URL
+        self._url_base = f"{self.vault_addr}/v1/"
         self.role_id = os.getenv("VAULT_ROLE_ID")
         self.secret_id = os.getenv("VAULT_SECRET_ID")
         self.token = os.getenv("VAULT_TOKEN")
         self.token_expiry = 0
+        # When to renew, on the monotonic clock so that changes to the wall
+        # clock (such as stealth_net.add_clock_skew) can't move it
+        self._renew_at = 0
+        # Held while the token is being obtained or renewed
+        self._token_lock = threading.Lock()
+        # Background renewal, started once a lease is known
+        self._renewal_thread = None
+        
+        # One session for all Vault calls, so they reuse a kept-alive
+        # connection instead of connecting (and handshaking) every time
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=VAULT_POOL_SIZE,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        if self.token:
+            self._session.headers["X-Vault-Token"] = self.token
         
         # Validate configuration
         if not (self.token or (self.role_id and self.secret_id)):
             logger.warning("No Vault authentication configured. Using environment variables only.")
         
-        # Connect to Vault if credentials are available
+        # Connect to Vault if credentials are available; either way the
+        # renewal thread starts once the token's lease is known
         if self.role_id and self.secret_id:
             self._authenticate_with_approle()
         elif self.token:
             logger.info("Using provided Vault token")
+            self._lookup_token()
+    
+    def _lookup_token(self):
+        """Take the lease of the provided token from Vault, if it can be renewed"""
+        try:
+            response = self._session.get(
+                self._url_base + "auth/token/lookup-self",
+                timeout=5
+            )
+            if response.status_code != 200:
+                logger.error(f"Failed to look up Vault token: {response.status_code}")
+                return
+            data = response.json()["data"]
+        except Exception as e:
+            logger.error(f"Error looking up Vault token: {str(e)}")
+            return
         
+        # A ttl of 0 is a token that never expires
+        if data.get("renewable") and data.get("ttl", 0) > 0:
+            self._set_lease(data["ttl"])
+        else:
+            logger.info("Provided Vault token is not renewable, not renewing it")
+    
     def _authenticate_with_approle(self) -> bool:
         """Authenticate with Vault using AppRole auth method"""
+        if not (self.role_id and self.secret_id):
+            # A provided token that has lapsed can't be replaced
+            return False
+        
         try:
             logger.info("Authenticating to Vault with AppRole")
             payload = {
@@ -62,17 +140,20 @@ class VaultClient:
                 "secret_id": self.secret_id
             }
             
-            response = requests.post(
-                f"{self.vault_addr}/v1/auth/approle/login",
+            # Logging in must not send a stale token (None drops the header)
+            response = self._session.post(
+                self._url_base + "auth/approle/login",
                 json=payload,
+                headers={"X-Vault-Token": None},
                 timeout=5
             )
             
             if response.status_code == 200:
                 auth_data = response.json()["auth"]
                 self.token = auth_data["client_token"]
+                self._session.headers["X-Vault-Token"] = self.token
                 # Calculate token expiry time (in seconds)
-                self.token_expiry = time.time() + auth_data["lease_duration"]
+                self._set_lease(auth_data["lease_duration"])
                 logger.info("Successfully authenticated to Vault")
                 return True
             else:
@@ -83,38 +164,84 @@ class VaultClient:
             logger.error(f"Error authenticating to Vault: {str(e)}")
             return False
     
-    def _renew_token_if_needed(self) -> bool:
-        """Renew Vault token if it's close to expiry"""
-        # If no token or token is expired, try to reauthenticate
+    def _set_lease(self, lease_duration: int):
+        """Record a new token lease, to be renewed two thirds of the way through"""
+        if lease_duration <= 0:
+            # A token without a lease never expires and has nothing to renew
+            self.token_expiry = float("inf")
+            self._renew_at = None
+            return
+        
+        self.token_expiry = time.time() + lease_duration
+        # Jitter, scaled to the lease, keeps many clients from renewing in
+        # lockstep
+        interval = lease_duration * 2 / 3 - random.uniform(0, min(60, lease_duration / 10))
+        self._renew_at = time.monotonic() + max(RENEW_MIN_INTERVAL, interval)
+        
+        # Keep the token renewed in the background, off the request path
+        if self._renewal_thread is None or not self._renewal_thread.is_alive():
+            self._renewal_thread = threading.Thread(target=self._renew_loop, name="vault-token-renewal", daemon=True)
+            self._renewal_thread.start()
+    
+    def _renew_loop(self):
+        """Renew the token as its lease runs down, until it can't be renewed any more"""
+        retry_delay = RENEW_RETRY_MIN
+        while True:
+            renew_at = self._renew_at
+            if renew_at is None:
+                # The token no longer has a lease
+                return
+            time.sleep(max(RENEW_MIN_INTERVAL, renew_at - time.monotonic()))
+            
+            with self._token_lock:
+                renewed = self._renew_token()
+            if renewed:
+                retry_delay = RENEW_RETRY_MIN
+                continue
+            
+            if not (self.role_id and self.secret_id) and time.time() >= self.token_expiry:
+                # Without AppRole there is nothing to log in again with
+                logger.error("Vault token expired and can't be renewed")
+                return
+            
+            # Don't hammer Vault while it is unreachable
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, RENEW_RETRY_MAX)
+    
+    def _renew_token(self) -> bool:
+        """Renew the Vault token, reauthenticating if that fails"""
+        # If no token, try to authenticate
         if not self.token:
             return self._authenticate_with_approle()
             
-        # If token is close to expiry (less than 10 minutes), renew it
-        if self.token_expiry - time.time() < 600:
-            try:
-                logger.info("Renewing Vault token")
-                headers = {"X-Vault-Token": self.token}
-                response = requests.post(
-                    f"{self.vault_addr}/v1/auth/token/renew-self",
-                    headers=headers,
-                    timeout=5
-                )
-                
-                if response.status_code == 200:
-                    auth_data = response.json()["auth"]
-                    self.token = auth_data["client_token"]
-                    self.token_expiry = time.time() + auth_data["lease_duration"]
-                    logger.info("Successfully renewed Vault token")
-                    return True
-                else:
-                    logger.warning("Failed to renew token, reauthenticating")
-                    return self._authenticate_with_approle()
-                    
-            except Exception as e:
-                logger.error(f"Error renewing Vault token: {str(e)}")
+        try:
+            logger.info("Renewing Vault token")
+            response = self._session.post(
+                self._url_base + "auth/token/renew-self",
+                timeout=5
+            )
+            
+            if response.status_code == 200:
+                auth_data = response.json()["auth"]
+                self.token = auth_data["client_token"]
+                self._session.headers["X-Vault-Token"] = self.token
+                self._set_lease(auth_data["lease_duration"])
+                logger.info("Successfully renewed Vault token")
+                return True
+            else:
+                logger.warning("Failed to renew token, reauthenticating")
                 return self._authenticate_with_approle()
-        
-        return True
+                
+        except Exception as e:
+            logger.error(f"Error renewing Vault token: {str(e)}")
+            return self._authenticate_with_approle()
+    
+    def _ensure_token(self) -> bool:
+        """Make sure there is a token; renewal is left to the background thread"""
+        if self.token:
+            return True
+        with self._token_lock:
+            return bool(self.token) or self._authenticate_with_approle()
     
     def get_secret(self, path: str) -> Optional[Dict[str, Any]]:
         """
@@ -126,18 +253,15 @@ class VaultClient:
         Returns:
             Dictionary containing secret data or None if failed
         """
-        # Ensure we have a valid token
-        if not self._renew_token_if_needed():
+        # Ensure we have a token
+        if not self._ensure_token():
             logger.error("Failed to authenticate to Vault")
             return None
         
         try:
             logger.info(f"Fetching secret from {path}")
-            headers = {"X-Vault-Token": self.token}
-            
-            response = requests.get(
-                f"{self.vault_addr}/v1/{path}",
-                headers=headers,
+            response = self._session.get(
+                self._url_base + path,
                 timeout=5
             )
             
@@ -161,18 +285,15 @@ class VaultClient:
         Returns:
             Dictionary containing secret data and lease info, or None if failed
         """
-        # Ensure we have a valid token
-        if not self._renew_token_if_needed():
+        # Ensure we have a token
+        if not self._ensure_token():
             logger.error("Failed to authenticate to Vault")
             return None
             
         try:
             logger.info(f"Requesting dynamic secret from {path}")
-            headers = {"X-Vault-Token": self.token}
-            
-            response = requests.get(
-                f"{self.vault_addr}/v1/{path}",
-                headers=headers,
+            response = self._session.get(
+                self._url_base + path,
                 timeout=5
             )
             
@@ -192,59 +313,118 @@ class VaultClient:
             logger.error(f"Error getting dynamic secret from Vault: {str(e)}")
             return None
 
+    def get_secrets(self, paths: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Get several secrets from Vault at once
+        
+        The reads run on a few threads sharing the session's pooled
+        connections, so their round trips overlap.
+        
+        Args:
+            paths: Paths to the secrets in Vault
+            
+        Returns:
+            Dictionary mapping each path to its secret data, or None if failed
+        """
+        paths = list(dict.fromkeys(paths))
+        if len(paths) <= 1:
+            return {path: self.get_secret(path) for path in paths}
+        
+        with ThreadPoolExecutor(max_workers=min(VAULT_POOL_SIZE, len(paths))) as executor:
+            return dict(zip(paths, executor.map(self.get_secret, paths)))
+
 # Singleton instance for application-wide use
 vault_client = VaultClient()
 
+# Secrets read from Vault, kept until refresh_config() is called. Failed
+# reads are not kept, so the environment fallback only lasts until Vault
+# answers
+_secret_cache: Dict[str, Dict[str, Any]] = {}
+
+def _cached_secret(path: str) -> Optional[Dict[str, Any]]:
+    """Secret at a Vault path, fetched once it has been read successfully"""
+    secret = _secret_cache.get(path)
+    if secret is None:
+        secret = vault_client.get_secret(path)
+        if secret:
+            _secret_cache[path] = secret
+    return secret
+
 def get_tor_credentials() -> Dict[str, str]:
     """Get Tor credentials from Vault or environment variables"""
     # Try to get credentials from Vault
-    creds = vault_client.get_secret("secret/data/tor/credentials")
+    creds = _cached_secret("secret/data/tor/credentials")
     
     if creds:
         return {
-            "socks_host": creds.get("socks_host", os.getenv("TOR_SOCKS_HOST", "tor")),
-            "socks_port": creds.get("socks_port", os.getenv("TOR_SOCKS_PORT", "9050"))
+            "socks_host": creds.get("socks_host", _TOR_HOST_ENV),
+            "socks_port": creds.get("socks_port", _TOR_PORT_ENV)
         }
     
     # Fall back to environment variables
     return {
-        "socks_host": os.getenv("TOR_SOCKS_HOST", "tor"),
-        "socks_port": os.getenv("TOR_SOCKS_PORT", "9050")
+        "socks_host": _TOR_HOST_ENV,
+        "socks_port": _TOR_PORT_ENV
     }
 
 def get_database_config() -> Dict[str, str]:
     """Get database configuration from Vault or environment variables"""
     # Try to get config from Vault
-    config = vault_client.get_secret("secret/data/database/config")
+    config = _cached_secret("secret/data/database/config")
     
     if config:
         return {
-            "path": config.get("path", os.getenv("CHROMA_DB_PATH", "/app/data/chroma_db")),
-            "collection": config.get("collection", os.getenv("COLLECTION_NAME", "samgpt"))
+            "path": config.get("path", _DB_PATH_ENV),
+            "collection": config.get("collection", _COLLECTION_ENV)
         }
     
     # Fall back to environment variables
     return {
-        "path": os.getenv("CHROMA_DB_PATH", "/app/data/chroma_db"),
-        "collection": os.getenv("COLLECTION_NAME", "samgpt")
+        "path": _DB_PATH_ENV,
+        "collection": _COLLECTION_ENV
     }
 
 def get_webhook_url() -> Optional[str]:
     """Get webhook URL for alerts from Vault or environment variables"""
     # Try to get webhook from Vault
-    webhook = vault_client.get_secret("secret/data/alerts/webhook")
+    webhook = _cached_secret("secret/data/alerts/webhook")
     
     if webhook and "url" in webhook:
         return webhook["url"]
     
     # Fall back to environment variable
-    return os.getenv("WEBHOOK_URL")
+    return _WEBHOOK_ENV
+
+def refresh_config():
+    """Drop cached configuration so the next lookup fetches it from Vault again"""
+    _secret_cache.clear()
+
+def get_all_config() -> Dict[str, Any]:
+    """
+    Get Tor credentials, database configuration and webhook URL together
+    
+    The three Vault reads are independent, so they are made concurrently
+    (over the client's pooled connections) instead of one after another.
+    
+    Returns:
+        Dictionary with "tor", "database" and "webhook" entries
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        tor = executor.submit(get_tor_credentials)
+        database = executor.submit(get_database_config)
+        webhook = executor.submit(get_webhook_url)
+        return {
+            "tor": tor.result(),
+            "database": database.result(),
+            "webhook": webhook.result()
+        }
 
 # Example of how to use this module:
 if __name__ == "__main__":
-    tor_creds = get_tor_credentials()
-    db_config = get_database_config()
-    webhook_url = get_webhook_url()
+    config = get_all_config()
+    tor_creds = config["tor"]
+    db_config = config["database"]
+    webhook_url = config["webhook"]
     
     print(f"Tor SOCKS Host: {tor_creds['socks_host']}")
     print(f"Tor SOCKS Port: {tor_creds['socks_port']}")
@@ -13,9 +13,11 @@ import argparse
 import hashlib
 import json
 import logging
+import mmap
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
 # Configure logging with redaction for sensitive values
@@ -35,58 +37,139 @@ CRITICAL_FILES = [
 # Public key for signature verification
 ATTESTATION_KEY_PATH = "/app/attestation_key.pub"
 
+# Expected Merkle root over the critical files' hashes (hex), and its
+# signature made with the attestation key; a root without a signature
+# is rejected
+INTEGRITY_ROOT_PATH = "/app/integrity_root"
+INTEGRITY_ROOT_SIGNATURE_PATH = "/app/integrity_root.sig"
+
 def calculate_file_hash(file_path: str) -> str:
     """Calculate SHA-256 hash of a file"""
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
         return ""
 
-    sha256_hash = hashlib.sha256()
     try:
         with open(file_path, "rb") as f:
-            # Read and update hash in chunks to handle large files efficiently
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+            # Python 3.11+ reads the file in large blocks straight into the hash
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            
+            # Otherwise map the file and hash it in one call, with no copies;
+            # an empty file can't be mapped
+            sha256_hash = hashlib.sha256()
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    sha256_hash.update(mm)
+            return sha256_hash.hexdigest()
     except Exception as e:
         logger.error(f"Error calculating hash for {file_path}: {e}")
         return ""
 
+def merkle_root(file_hashes: Dict[str, str]) -> str:
+    """
+    Calculate a Merkle root over file hashes
+    
+    Leaves are SHA-256(0x00 + path + NUL + digest) in path order, so one root
+    covers both which files are checked and their contents. Interior nodes are
+    SHA-256(0x01 + left + right); the distinct prefixes (as in RFC 6962) keep
+    a leaf from being passed off as a node. An odd node at any level is
+    carried up unchanged.
+    
+    Args:
+        file_hashes: Mapping of file path to hex SHA-256 digest
+        
+    Returns:
+        Hex digest of the root
+    """
+    level = [
+        hashlib.sha256(b"\x00" + path.encode() + b"\0" + bytes.fromhex(digest)).digest()
+        for path, digest in sorted(file_hashes.items())
+    ]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    
+    while len(level) > 1:
+        paired = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+def verify_root_signature(root: str) -> bool:
+    """Verify the signature over the expected Merkle root with the attestation key"""
+    try:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+        
+        with open(ATTESTATION_KEY_PATH, "rb") as f:
+            public_key = load_pem_public_key(f.read())
+        with open(INTEGRITY_ROOT_SIGNATURE_PATH, "rb") as f:
+            signature = f.read()
+        
+        # ECDSA keys (as cosign generates) take a hash algorithm; Ed25519 doesn't
+        if isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(signature, root.encode(), ec.ECDSA(hashes.SHA256()))
+        else:
+            public_key.verify(signature, root.encode())
+        return True
+    except InvalidSignature:
+        logger.error("Integrity root signature is invalid!")
+        return False
+    except Exception as e:
+        logger.error(f"Error verifying integrity root signature: {e}")
+        return False
+
 def verify_image_signature() -> bool:
     """
     Verify container image signature using cosign (if available)
     In production, this would use OIDC tokens and KMS
     """
+    image = os.environ.get("CONTAINER_IMAGE", "")
+    if not image:
+        # cosign would only start up to reject the empty reference
+        logger.warning("CONTAINER_IMAGE is not set, checking for read-only filesystem")
+        return check_read_only_filesystem()
+    
     try:
         # Try to use cosign if it's available in the container
-        # Real implementation would use the actual image digest
+        # Real implementation would use the actual image digest. Its output
+        # is discarded and only stderr is kept, decoded just on failure
         result = subprocess.run(
-            ["cosign", "verify", "--key", ATTESTATION_KEY_PATH, os.environ.get("CONTAINER_IMAGE", "")],
-            capture_output=True,
-            text=True
+            ["cosign", "verify", "--key", ATTESTATION_KEY_PATH, image],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
         )
         if result.returncode == 0:
             logger.info("Image signature verified successfully")
             return True
         else:
-            logger.error(f"Image signature verification failed: {result.stderr}")
+            stderr = result.stderr.decode(errors="replace")
+            logger.error(f"Image signature verification failed: {stderr}")
             return False
     except FileNotFoundError:
-        # Fall back to checking if we're running in a read-only container
-        # which is a partial indication of integrity
         logger.warning("cosign not found, checking for read-only filesystem")
-        try:
-            # Try to write to a protected location
-            with open("/app/test_write", "w") as f:
-                f.write("test")
-            # If we got here, filesystem is writable (bad)
-            os.remove("/app/test_write")
-            logger.error("Filesystem is writable - container integrity compromised!")
-            return False
-        except PermissionError:
-            # Expected behavior in read-only container
-            logger.info("Filesystem is read-only as expected")
-            return True
+        return check_read_only_filesystem()
+
+def check_read_only_filesystem() -> bool:
+    """
+    Check that the container's filesystem is read-only, which is a partial
+    indication of integrity when the image signature can't be verified
+    """
+    try:
+        # Try to write to a protected location
+        with open("/app/test_write", "w") as f:
+            f.write("test")
+        # If we got here, filesystem is writable (bad)
+        os.remove("/app/test_write")
+        logger.error("Filesystem is writable - container integrity compromised!")
+        return False
+    except PermissionError:
+        # Expected behavior in read-only container
+        logger.info("Filesystem is read-only as expected")
+        return True
 
 def get_tpm_quote() -> Optional[Dict]:
     """
@@ -114,16 +197,40 @@ def verify_file_integrity() -> bool:
     try:
         integrity_check_passed = True
         
-        for file_path in CRITICAL_FILES:
-            file_hash = calculate_file_hash(file_path)
+        # hashlib releases the GIL while hashing, so files are read and
+        # hashed in parallel
+        with ThreadPoolExecutor(max_workers=min(8, len(CRITICAL_FILES))) as executor:
+            hashes = dict(zip(CRITICAL_FILES, executor.map(calculate_file_hash, CRITICAL_FILES)))
+        
+        for file_path, file_hash in hashes.items():
             if not file_hash:
                 integrity_check_passed = False
                 continue
                 
             logger.info(f"File {file_path} has hash: {file_hash}")
-            # In production: verify against known good hashes from secure source
         
-        return integrity_check_passed
+        if not integrity_check_passed:
+            return False
+        
+        # All files are checked at once by comparing a single Merkle root
+        root = merkle_root(hashes)
+        logger.info(f"Critical files Merkle root: {root}")
+        if not os.path.exists(INTEGRITY_ROOT_PATH):
+            # In production: verify against a known good root from secure source
+            return True
+        
+        with open(INTEGRITY_ROOT_PATH) as f:
+            expected_root = f.read().strip()
+        # An unsigned root could have been written by whoever altered the files
+        if not os.path.exists(INTEGRITY_ROOT_SIGNATURE_PATH):
+            logger.error(f"Integrity root signature not found: {INTEGRITY_ROOT_SIGNATURE_PATH}")
+            return False
+        if not verify_root_signature(expected_root):
+            return False
+        if root != expected_root:
+            logger.error("Critical files do not match the expected Merkle root!")
+            return False
+        return True
     except Exception as e:
         logger.error(f"Error verifying file integrity: {e}")
         return False